@@ -0,0 +1,236 @@
+"""
+cold start 벤치마크: 새 프로세스에서 main import → lifespan 시작 → 첫 /chat 200 까지의 시간
+
+    cd api && python bench/bench_coldstart.py [--runs 5] [--modes lifespan,lazy] [--backends stub,openai]
+                                              [--importtime 15] [--out bench/results/coldstart.json]
+
+- 매 측정마다 새 python 프로세스를 띄운다 (import 캐시가 없는 상태)
+- openai 백엔드는 이 스크립트가 띄우는 로컬 가짜 Responses API 서버(OPENAI_BASE_URL)로 보내므로
+  네트워크 없이 SDK import / client 생성 / HTTP 왕복까지 포함해서 잰다
+- rules.db 는 임시 디렉터리에 복사해서 쓴다 (원본을 건드리지 않도록). --snapshot 이면 rules.snap 도 만든다
+- --importtime N: python -X importtime 결과에서 누적 시간이 큰 모듈 N 개를 같이 출력
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+from llm_backend import sample_from_schema  # noqa: E402
+from rules_blob import write_blob  # noqa: E402
+
+
+# 자식 프로세스: 단계별 시각을 JSON 한 줄로 출력
+# (httpx 같은 클라이언트 라이브러리를 쓰면 그 import 가 앱 쪽 import 비용을 가리므로 ASGI 를 직접 호출)
+CHILD = r"""
+import time
+t0 = time.perf_counter()
+import asyncio, json
+import main
+t1 = time.perf_counter()
+
+BODY = json.dumps({
+    "messages": [{"role": "user", "content": "요즘 연락이 줄었어"}],
+    "mbti": "INFP", "relationship_type": "romantic_relationship", "relationship_state": "stable",
+}).encode("utf-8")
+
+async def post(path, body):
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Future()  # 연결은 끊기지 않음
+
+    async def send(message):
+        sent.append(message)
+
+    await main.app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"coldstart"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("coldstart", 80),
+    }, receive, send)
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
+
+async def go():
+    async with main.lifespan(main.app):
+        t2 = time.perf_counter()
+        status = await post("/chat", BODY)
+        t3 = time.perf_counter()
+    return status, t2, t3
+
+status, t2, t3 = asyncio.run(go())
+print(json.dumps({"status": status, "import_ms": (t1 - t0) * 1e3, "startup_ms": (t2 - t1) * 1e3,
+                  "first_chat_ms": (t3 - t2) * 1e3, "in_process_ms": (t3 - t0) * 1e3}))
+"""
+
+
+# ==========================
+# 가짜 Responses API
+# ==========================
+
+class FakeResponsesHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        fmt = (body.get("text") or {}).get("format") or {}
+        if fmt.get("type") == "json_schema":
+            text = json.dumps(sample_from_schema(fmt["schema"], {
+                "assistant_message": "(coldstart) 얘기 잘 들었어.",
+                "analysis_json.updated_traits_patch": [],
+            }), ensure_ascii=False)
+        else:
+            text = "(coldstart) 요약"
+        payload = json.dumps({
+            "id": "resp_coldstart",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "fake"),
+            "status": "completed",
+            "output": [{
+                "type": "message", "id": "msg_coldstart", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": {
+                "input_tokens": 1, "output_tokens": 1, "total_tokens": 2,
+                "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_openai() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeResponsesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ==========================
+# 측정
+# ==========================
+
+def child_env(mode: str, backend: str, base_url: str, db_path: Path) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "RULES_DB_PATH": str(db_path),
+        "STARTUP_WARMUP": mode,
+        "LLM_BACKEND": backend,
+        "SUMMARY_ENABLED": "0",
+        "RESPONSE_CACHE_SIZE": "0",
+        "LLM_STUB_LATENCY": "fixed:0",
+        "OPENAI_API_KEY": "coldstart",
+        "OPENAI_BASE_URL": base_url,
+    })
+    return env
+
+
+def run_once(mode: str, backend: str, base_url: str, db_path: Path) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=API_DIR, env=child_env(mode, backend, base_url, db_path),
+        capture_output=True, text=True,
+    )
+    wall = (time.perf_counter() - started) * 1e3
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode}/{backend} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_wall_ms"] = wall
+    return result
+
+
+def import_profile(base_url: str, db_path: Path, top: int) -> list[dict]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=API_DIR,
+        env=child_env("lifespan", "openai", base_url, db_path), capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # 들여쓰기 2칸 = 한 단계
+        # main 자신(depth 0)과 main 이 직접 import 하는 모듈(depth 1)만
+        if depth <= 1:
+            rows.append({"module": name.strip(), "self_ms": int(self_us) / 1e3, "cumulative_ms": int(cumulative_us) / 1e3})
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="lifespan,lazy")
+    parser.add_argument("--backends", default="stub,openai")
+    parser.add_argument("--snapshot", action="store_true", help="rules.snap 을 만들어 두고 측정")
+    parser.add_argument("--importtime", type=int, default=15, help="출력할 import 상위 모듈 수 (0 이면 생략)")
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (기본: bench/results/coldstart-<commit>.json)")
+    args = parser.parse_args()
+
+    server = start_fake_openai()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    tmp = tempfile.TemporaryDirectory()
+    db_path = Path(tmp.name) / "rules.db"
+    shutil.copy(API_DIR / "rules.db", db_path)
+    if args.snapshot:
+        write_blob(db_path, db_path.with_suffix(".snap"))
+
+    result: dict = {
+        "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args), "runs": {},
+    }
+    fields = ("import_ms", "startup_ms", "first_chat_ms", "in_process_ms", "process_wall_ms")
+    for backend in args.backends.split(","):
+        for mode in args.modes.split(","):
+            samples = [run_once(mode, backend, base_url, db_path) for _ in range(args.runs)]
+            bad = [s["status"] for s in samples if s["status"] != 200]
+            if bad:
+                raise RuntimeError(f"{mode}/{backend}: first /chat returned {bad}")
+            medians = {f: statistics.median(s[f] for s in samples) for f in fields}
+            result["runs"][f"{backend}/{mode}"] = medians
+            print(
+                f"{backend:<7} {mode:<9} import={medians['import_ms']:7.1f}ms startup={medians['startup_ms']:7.1f}ms "
+                f"first_chat={medians['first_chat_ms']:7.1f}ms  total(in-process)={medians['in_process_ms']:7.1f}ms "
+                f"wall={medians['process_wall_ms']:7.1f}ms"
+            )
+
+    if args.importtime:
+        result["import_profile"] = import_profile(base_url, db_path, args.importtime)
+        print("\nimport main: 직접 import 하는 모듈 (누적 ms)")
+        for row in result["import_profile"]:
+            print(f"  {row['module']:<24} {row['cumulative_ms']:8.1f}")
+
+    server.shutdown()
+    tmp.cleanup()
+    out = Path(args.out) if args.out else API_DIR / "bench" / "results" / f"coldstart-{result['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"saved: {out}")
+
+
+if __name__ == "__main__":
+    main()
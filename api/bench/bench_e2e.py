@@ -0,0 +1,257 @@
+"""
+/chat end-to-end 벤치마크: ASGI 앱을 프로세스 안에서 직접 호출하고 LLM 은 stub 백엔드로 대체
+
+    cd api && python bench/bench_e2e.py [--requests 400] [--concurrency 32] [--latency fixed:0.05]
+                                         [--history 60] [--state-depth 4] [--out bench/results/e2e.json]
+
+- 16개 MBTI x 관계 유형/상태 조합, 긴 히스토리, 깊은 traits_profile.state 로 payload 생성
+- 요청 처리량(req/s), p50/p95/p99 latency, 단계별(컨텍스트 조회, traits 병합, 프롬프트 조립, 규칙 조회, patch 필터, 응답 검증) 소요 시간
+- 결과는 JSON 으로 저장 (git commit 포함) 해서 커밋 간 비교
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+
+# ==========================
+# payload 생성
+# ==========================
+
+USER_LINES = [
+    "어제 연락이 갑자기 줄었는데 내가 뭘 잘못한 걸까?",
+    "주말에 만나자고 했더니 바쁘다고만 하더라.",
+    "카톡 답장이 몇 시간씩 늦어지는 게 계속 신경 쓰여.",
+    "같이 있을 때는 잘해주는데 떨어져 있으면 너무 무심해.",
+    "회의 때 내 의견을 자꾸 끊어서 서운했어.",
+]
+ASSISTANT_LINES = [
+    "그럴 때 불안한 마음이 드는 건 자연스러워. 상대가 요즘 어떤 상황인지 먼저 확인해보자.",
+    "바로 결론 내리기보다는 최근 패턴을 조금 더 지켜보는 게 좋아 보여.",
+    "직접 물어볼 때는 비난처럼 들리지 않게 네 감정을 중심으로 말해보는 걸 추천해.",
+]
+
+
+def make_history(rng: random.Random, length: int) -> list[dict]:
+    messages = []
+    for i in range(length):
+        if i % 2 == 0:
+            text = " ".join(rng.choice(USER_LINES) for _ in range(rng.randint(1, 3)))
+            messages.append({"role": "user", "content": text})
+        else:
+            text = " ".join(rng.choice(ASSISTANT_LINES) for _ in range(rng.randint(1, 4)))
+            messages.append({"role": "assistant", "content": text})
+    if messages[-1]["role"] != "user":
+        messages.append({"role": "user", "content": rng.choice(USER_LINES)})
+    return messages
+
+
+def make_state(rng: random.Random, depth: int, fanout: int = 4) -> dict:
+    if depth == 0:
+        return {f"k{i}": [rng.choice(USER_LINES), rng.random()] for i in range(fanout)}
+    return {f"n{i}": make_state(rng, depth - 1, fanout) for i in range(fanout)}
+
+
+def make_payloads(rng: random.Random, count: int, mbtis: list[str], types: list[str], states: list[str], args) -> list[dict]:
+    payloads = []
+    for i in range(count):
+        mbti = mbtis[i % len(mbtis)]
+        payloads.append({
+            "messages": make_history(rng, rng.randint(args.history // 2, args.history)),
+            "mbti": mbti,
+            "relationship_type": rng.choice(types),
+            "relationship_state": rng.choice(states),
+            "traits_profile": {
+                "type": mbti,
+                "base": {"user": {"attachment": "anxious", "tags": ["연락 중요"]}},
+                "state": {"context": make_state(rng, args.state_depth), "user": {"memory": make_state(rng, 2)}},
+                "evidence": [],
+            },
+            "traits_response": "diff",
+        })
+    return payloads
+
+
+# ==========================
+# 단계별 시간
+# ==========================
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def wrap(self, name: str, fn):
+        self.calls[name] += 0  # 한 번도 호출되지 않은 단계도 report / unused 에 나오도록
+        self.seconds[name] += 0.0
+
+        def timed(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                self.seconds[name] += time.perf_counter() - started
+                self.calls[name] += 1
+        return timed
+
+    def unused(self) -> list[str]:
+        return sorted(name for name, calls in self.calls.items() if calls == 0)
+
+    def report(self, requests: int) -> dict:
+        return {
+            name: {
+                "calls": self.calls[name],
+                "total_ms": self.seconds[name] * 1e3,
+                "per_request_us": self.seconds[name] / requests * 1e6 if requests else 0.0,
+            }
+            for name in sorted(self.seconds)
+        }
+
+
+def instrument(main, timer: StageTimer):
+    # main 안의 함수들은 호출 시점에 전역 이름으로 찾으므로 모듈 속성만 바꿔치기하면 된다
+    # /chat 처리 중 실제로 호출되는 단계만 (build_llm_params → 파싱/patch 필터 → traits 응답)
+    for name in (
+        "load_chat_context",
+        "merge_user_traits",
+        "build_instructions",
+        "to_responses_input",
+        "filter_updated_traits_patch",
+        "parse_llm_output",
+        "apply_traits_patch",
+    ):
+        setattr(main, name, timer.wrap(name, getattr(main, name)))
+    # 규칙/프로필 조회는 스냅샷 기반 프롬프트 조각 캐시를 거친다
+    assembler = main.prompt_assembler
+    assembler.profile_block = timer.wrap("rules.profile_block", assembler.profile_block)
+    assembler.rules_block = timer.wrap("rules.rules_block", assembler.rules_block)
+    main.context_window.fit = timer.wrap("context_window.fit", main.context_window.fit)
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(main, payloads: list[dict], concurrency: int, endpoint: str) -> tuple[list[float], dict, float]:
+    import httpx
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = defaultdict(int)
+    # 요청 본문은 미리 인코딩해 둠 (클라이언트 쪽 직렬화 시간이 측정에 섞이지 않게)
+    queue = [json.dumps(p, ensure_ascii=False).encode("utf-8") for p in reversed(payloads)]
+    headers = {"content-type": "application/json"}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            while queue:
+                payload = queue.pop()
+                started = time.perf_counter()
+                r = await client.post(endpoint, content=payload, headers=headers)
+                if endpoint.endswith("/stream"):
+                    await r.aread()
+                latencies.append(time.perf_counter() - started)
+                statuses[r.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return latencies, dict(statuses), wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--endpoint", default="/chat", choices=["/chat", "/chat/stream"])
+    parser.add_argument("--latency", default="fixed:0.05", help="stub LLM latency 분포 (LLM_STUB_LATENCY 형식)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--history", type=int, default=60, help="최대 히스토리 메시지 수")
+    parser.add_argument("--state-depth", type=int, default=4, help="traits_profile.state 중첩 깊이 (fanout 4)")
+    parser.add_argument("--response-cache", action="store_true", help="응답 캐시를 켠 채로 측정 (기본은 끔)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (기본: bench/results/e2e-<commit>.json)")
+    args = parser.parse_args()
+
+    # main 은 import 시점에 환경 변수를 읽는다
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_LATENCY"] = args.latency
+    os.environ["LLM_STUB_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["LLM_STUB_TRUNCATE_RATE"] = str(args.truncate_rate)
+    os.environ["LLM_STUB_SEED"] = str(args.seed)
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("LLM_MAX_WAITING", str(args.concurrency * 4))
+    os.environ.setdefault("SUMMARY_ENABLED", "0")
+    os.environ.setdefault("RULES_DB_PATH", str(API_DIR / "rules.db"))
+    if not args.response_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+    import main as app_main
+
+    app_main.rules_repo.load()
+    snapshot = app_main.rules_repo.snapshot
+    rng = random.Random(args.seed)
+    payloads = make_payloads(
+        rng, args.requests, sorted(snapshot.profiles), sorted(snapshot.type_rules), sorted(snapshot.state_rules), args
+    )
+
+    timer = StageTimer()
+    instrument(app_main, timer)
+
+    latencies, statuses, wall = asyncio.run(run(app_main, payloads, args.concurrency, args.endpoint))
+    latencies.sort()
+    unused = timer.unused()
+    if unused:
+        # 함수 이름이 바뀌었거나 호출 경로에서 빠진 단계: 결과에 조용히 빠지지 않도록 실패 처리
+        raise SystemExit(f"instrumented stages were never called: {', '.join(unused)}")
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "requests": len(latencies),
+        "statuses": statuses,
+        "wall_seconds": wall,
+        "requests_per_second": len(latencies) / wall if wall else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1e3,
+            "p95": percentile(latencies, 95) * 1e3,
+            "p99": percentile(latencies, 99) * 1e3,
+            "max": latencies[-1] * 1e3,
+        },
+        "stages": timer.report(len(latencies)),
+        "usage": app_main.usage(),
+    }
+
+    out = Path(args.out) if args.out else API_DIR / "bench" / "results" / f"e2e-{result['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"{result['requests']} requests, {result['requests_per_second']:.1f} req/s, statuses={statuses}")
+    print("latency ms: " + ", ".join(f"{k}={v:.1f}" for k, v in result["latency_ms"].items()))
+    for name, stage in result["stages"].items():
+        print(f"  {name:<34} {stage['calls']:>6} calls {stage['per_request_us']:10.1f} us/req")
+    print(f"saved: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+deep_merge 마이크로 벤치마크: 예전 deepcopy 방식 vs 구조 공유 방식
+
+    cd api && python bench/bench_merge.py [--depth 4] [--fanout 8] [--number 200]
+"""
+import argparse
+import copy
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from traits_merge import deep_merge  # noqa: E402
+from response_cache import canonical_key  # noqa: E402
+
+
+def legacy_deep_merge(base: dict, state: dict):
+    # 기존 main.py 구현 그대로
+    merged = copy.deepcopy(base)
+
+    for k, v in state.items():
+        if isinstance(v, dict) and k in merged:
+            merged[k] = legacy_deep_merge(merged.get(k, {}), v)
+        else:
+            merged[k] = v
+    return merged
+
+
+def make_tree(depth: int, fanout: int, prefix: str = "k") -> dict:
+    if depth == 0:
+        return {f"{prefix}_{i}": [f"값 {i}", i, True] for i in range(fanout)}
+    return {f"{prefix}_{i}": make_tree(depth - 1, fanout, f"{prefix}{i}") for i in range(fanout)}
+
+
+def make_overlay(tree: dict, every: int = 3) -> dict:
+    # 일부 경로만 덮어쓰는 state (실제 patch 처럼 드문드문)
+    overlay = {}
+    for i, (k, v) in enumerate(tree.items()):
+        if i % every:
+            continue
+        overlay[k] = make_overlay(v, every) if isinstance(v, dict) else ["updated"]
+    return overlay
+
+
+def count_nodes(tree) -> int:
+    if isinstance(tree, dict):
+        return 1 + sum(count_nodes(v) for v in tree.values())
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    profile = make_tree(2, 6, "p")
+    user_base = make_tree(1, 4, "b")
+    user_state = make_tree(args.depth, args.fanout, "s")
+    overlay = make_overlay(user_state)
+    traits_profile = {"type": "ISTP", "base": user_base, "state": user_state, "evidence": []}
+
+    assert legacy_deep_merge(user_state, overlay) == deep_merge(user_state, overlay)
+
+    def legacy_merge_traits():
+        user = legacy_deep_merge(user_base, user_state)
+        return legacy_deep_merge(profile, user)
+
+    def shared_merge_traits():
+        user = deep_merge(user_base, user_state)
+        return deep_merge(profile, user)
+
+    cases = [
+        ("legacy deep_merge(state, overlay)", lambda: legacy_deep_merge(user_state, overlay)),
+        ("shared deep_merge(state, overlay)", lambda: deep_merge(user_state, overlay)),
+        ("legacy merge_traits", legacy_merge_traits),
+        ("shared merge_traits", shared_merge_traits),
+        # 병합 결과를 traits_profile 해시로 캐시하는 것보다 매번 병합하는 쪽이 싸다
+        ("canonical_key(traits_profile)", lambda: canonical_key(traits_profile)),
+    ]
+
+    print(f"state nodes={count_nodes(user_state)}, json bytes={len(json.dumps(user_state, ensure_ascii=False))}")
+    results = {}
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        results[name] = best
+        print(f"{name:<38} {best * 1e6:10.1f} us")
+
+    print(f"speedup merge_traits: {results['legacy merge_traits'] / results['shared merge_traits']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+규칙 조회 벤치마크: 호출마다 connect/close (예전 fetch_*) vs 커넥션 풀 (live 모드) vs 메모리 스냅샷
+
+    cd api && python bench/bench_sqlite.py [--threads 1,4,16] [--requests 5000] [--pool-size 4]
+
+한 "요청" = 프로필 + 관계 유형 규칙 + 관계 상태 규칙 3회 조회 (*_single_query / *_context 는 chat_context 1회).
+원본 rules.db 는 건드리지 않도록 임시 디렉터리에 복사해서 WAL 로 바꾼 뒤 측정한다.
+"""
+import argparse
+import json
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+from rules_repo import LiveRulesReader, load_snapshot  # noqa: E402
+from sqlite_pool import SQLitePool, enable_wal  # noqa: E402
+
+
+class PerCallReader:
+    # 기존 main.py 의 fetch_* 구현 그대로 (호출마다 connect → execute → close)
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def profile(self, mbti):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT profile_json
+            FROM mbti_profiles
+            WHERE mbti=? AND is_active=1
+            LIMIT 1
+        """, (mbti,))
+        row = cur.fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else {}
+
+    def _rules(self, table, code_col, code):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT display_name, rules_json
+            FROM {table}
+            WHERE {code_col}=? AND is_active=1
+            LIMIT 1
+        """, (code,))
+        row = cur.fetchone()
+        conn.close()
+        if not row:
+            return {code_col: code, "display_name": None, "rules": []}
+        return {code_col: code, "display_name": row[0], "rules": json.loads(row[1]).get("rules", [])}
+
+    def type_rules_payload(self, code):
+        return self._rules("relationship_type_modifiers", "type_code", code)
+
+    def state_rules_payload(self, code):
+        return self._rules("relationship_state_modifiers", "state_code", code)
+
+
+class ChatContextReader:
+    # 3회 조회 대신 chat_context 한 번 (live 면 UNION ALL 쿼리 1개)
+    def __init__(self, source):
+        self.source = source
+
+    def lookup(self, mbti, type_code, state_code):
+        self.source.chat_context(mbti, type_code, state_code)
+
+
+def run(reader, keys: list[tuple[str, str, str]], threads: int) -> dict:
+    def one(key):
+        mbti, type_code, state_code = key
+        started = time.perf_counter()
+        if isinstance(reader, ChatContextReader):
+            reader.lookup(mbti, type_code, state_code)
+        else:
+            reader.profile(mbti)
+            reader.type_rules_payload(type_code)
+            reader.state_rules_payload(state_code)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(one, keys))
+    wall = time.perf_counter() - started
+    return {
+        "requests_per_second": len(keys) / wall,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=str(API_DIR / "rules.db"))
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (지정하면 저장)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "rules.db"
+        shutil.copy(args.db, db_path)
+        journal_mode = enable_wal(db_path)
+
+        snapshot = load_snapshot(db_path)
+        rng = random.Random(1)
+        keys = [
+            (rng.choice(list(snapshot.profiles)), rng.choice(list(snapshot.type_rules)), rng.choice(list(snapshot.state_rules)))
+            for _ in range(args.requests)
+        ]
+
+        results: dict = {"journal_mode": journal_mode, "requests": args.requests, "pool_size": args.pool_size, "runs": {}}
+        for threads in (int(t) for t in args.threads.split(",")):
+            pool = SQLitePool(db_path, size=args.pool_size)
+            readers = {
+                "per_call_connect": PerCallReader(db_path),
+                "pool": LiveRulesReader(pool),
+                "pool_single_query": ChatContextReader(LiveRulesReader(pool)),
+                "snapshot": snapshot,
+                "snapshot_context": ChatContextReader(snapshot),
+            }
+            for name, reader in readers.items():
+                result = run(reader, keys, threads)
+                results["runs"][f"{name}@{threads}"] = result
+                print(
+                    f"{name:<18} threads={threads:<3} {result['requests_per_second']:10.0f} req/s"
+                    f"  p50={result['p50_us']:8.1f}us  p99={result['p99_us']:8.1f}us"
+                )
+            pool.close()
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # 선택 의존성: 없으면 문자 수 기반 추정으로 대체
+    tiktoken = None
+
+
+# ==========================
+# 토큰 카운터
+# ==========================
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role/구분자 등 메시지당 고정 비용 (대략치)
+
+
+def _load_encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        # 인코딩 파일이 로컬 캐시에 없으면 네트워크가 필요하므로 실패 시 추정치로 대체
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+class TokenCounter:
+    """tiktoken 이 있으면 로컬 BPE 로 세고, 없으면 보수적으로 추정한다"""
+
+    def __init__(self, encoding_name: str = "o200k_base"):
+        self._encoding = _load_encoding(encoding_name)
+        self.exact = self._encoding is not None
+        # 같은 메시지는 매 턴 다시 세지 않도록 내용 기준 캐시
+        self.count = lru_cache(maxsize=4096)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # ASCII 는 4글자당 1토큰, 한글 등 나머지는 글자당 1토큰 정도로 계산 (과소추정 방지)
+        ascii_chars = sum(1 for c in text if c < "\x80")
+        return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+    def count_message(self, content: str) -> int:
+        return self.count(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+# ==========================
+# 롤링 요약 (로컬, 추출식)
+# ==========================
+
+SUMMARY_LINE_CHARS = 160
+ROLE_LABELS = {"user": "사용자", "assistant": "상담사"}
+
+
+def _summary_line(role: str, content: str) -> str:
+    text = " ".join(content.split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS] + "…"
+    return f"- {ROLE_LABELS.get(role, role)}: {text}"
+
+
+class RollingSummaryCache:
+    """
+    창 밖으로 밀려난 앞쪽 메시지들의 요약 줄 목록을 prefix 해시 기준으로 캐시한다.
+    대화가 한 턴 늘면 직전 prefix 의 결과에 새로 밀려난 메시지만 접어 넣는다.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def _put(self, key: str, value: tuple[str, ...]):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def lines_for(self, dropped: Sequence) -> tuple[str, ...]:
+        # prefix 해시를 앞에서부터 이어 붙여 계산하고, 캐시에 있는 가장 긴 prefix 부터 이어서 접는다
+        hashes = []
+        h = b""
+        for m in dropped:
+            h = hashlib.sha1(h + m.role.encode() + b"\0" + m.content.encode("utf-8")).digest()
+            hashes.append(h.hex())
+
+        start, lines = 0, ()
+        for i in range(len(hashes) - 1, -1, -1):
+            cached = self._get(hashes[i])
+            if cached is not None:
+                start, lines = i + 1, cached
+                break
+
+        for i in range(start, len(dropped)):
+            lines = lines + (_summary_line(dropped[i].role, dropped[i].content),)
+            self._put(hashes[i], lines)
+        return lines
+
+
+# ==========================
+# 컨텍스트 창
+# ==========================
+
+@dataclass(frozen=True)
+class ContextWindowResult:
+    messages: list  # 그대로 보낼 최신 메시지들 (시간순)
+    summary: Optional[str]  # 잘린 앞부분 요약 (없으면 None)
+    dropped_count: int
+    tokens_before: int  # 전체 히스토리를 그대로 보냈다면
+    tokens_after: int  # 실제로 보내는 메시지 + 요약
+
+
+class ContextWindow:
+    """
+    최신 메시지부터 거꾸로 담아서 token_budget 안에 들어가는 만큼은 원문 그대로 두고,
+    그보다 오래된 메시지는 summary_budget 안의 롤링 요약으로 바꾼다.
+    가장 최근 메시지는 예산을 넘더라도 항상 포함한다.
+    """
+
+    def __init__(self, token_budget: int, summary_budget: int, counter: TokenCounter | None = None):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.counter = counter or TokenCounter()
+        self.summaries = RollingSummaryCache()
+
+    def fit(self, messages: Sequence) -> ContextWindowResult:
+        costs = [self.counter.count_message(m.content) for m in messages]
+        tokens_before = sum(costs)
+
+        used = 0
+        split = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            if used + costs[i] > self.token_budget and split < len(messages):
+                break
+            used += costs[i]
+            split = i
+
+        kept = list(messages[split:])
+        if split == 0:
+            return ContextWindowResult(kept, None, 0, tokens_before, used)
+
+        summary = self._render_summary(self.summaries.lines_for(messages[:split]))
+        summary_tokens = self.counter.count(summary)
+        return ContextWindowResult(kept, summary, split, tokens_before, used + summary_tokens)
+
+    def _render_summary(self, lines: tuple[str, ...]) -> str:
+        # 예산을 넘으면 오래된 줄부터 버린다 (최근 맥락이 더 중요)
+        picked: list[str] = []
+        used = 0
+        for line in reversed(lines):
+            cost = self.counter.count(line)
+            if used + cost > self.summary_budget:
+                break
+            picked.append(line)
+            used += cost
+        omitted = len(lines) - len(picked)
+        head = [f"(더 이전 메시지 {omitted}개 생략)"] if omitted else []
+        return "\n".join(head + picked[::-1])
@@ -0,0 +1,26 @@
+# gunicorn 으로 멀티 worker 실행 (serve.py 와 같은 방식: preload 후 fork, 캐시/세션은 SQLite 로 공유)
+#
+#     cd api && gunicorn -c gunicorn.conf.py main:app
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from serve import DEFAULT_STATE_DIR, configure_shared_state  # noqa: E402
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = 30
+
+# 설정 파일은 앱(preload)보다 먼저 읽히므로 여기서 환경 변수를 잡아두면 main 이 import 시점에 읽는다
+configure_shared_state(Path(os.environ.get("SHARED_STATE_DIR", str(DEFAULT_STATE_DIR))), workers)
+
+
+def on_starting(server):
+    # preload_app 으로 main 은 이미 import 된 상태. fork 전에 스냅샷을 읽어두고 gc.freeze
+    import main
+
+    main.preload()
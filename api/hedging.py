@@ -0,0 +1,157 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from limiter import ConcurrencyLimiter
+
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """최근 성공한 호출 latency 의 분위수 (샘플이 min_samples 보다 적으면 None)"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+
+class Hedger(Generic[T]):
+    """
+    첫 호출이 최근 latency 의 p 분위수 안에 끝나지 않으면 같은 호출을 하나 더 띄우고,
+    먼저 성공한 쪽을 쓰고 나머지는 취소한다 (tail latency 절감).
+    - 최근 budget_window 건 중 hedge 비율이 budget_ratio 를 넘지 않게 제한 (장애 때 트래픽 증폭 방지)
+    - limiter 가 있으면 hedge 는 그 limiter 의 자리를 따로 하나 차지하고, 빈 자리가 없으면 띄우지 않는다
+      (첫 호출의 자리만으로 두 번 보내면 upstream 동시 호출 수가 한도의 2배까지 늘어남)
+    - 진 쪽이 쓴 토큰은 wasted 로 센다. 끝까지 받은 경우는 실제 usage,
+      중간에 취소한 경우는 이긴 쪽 usage 를 경과 시간 비율로 나눈 추정치
+    """
+
+    def __init__(
+        self,
+        tokens_of: Callable[[T], tuple[int, int]],
+        percentile: float = 90,
+        budget_ratio: float = 0.1,
+        min_delay: float = 1.0,
+        budget_window: int = 200,
+        latency: LatencyTracker | None = None,
+        limiter: ConcurrencyLimiter | None = None,
+    ):
+        self.tokens_of = tokens_of  # 결과 → (input_tokens, output_tokens)
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_delay = min_delay
+        self.latency = latency or LatencyTracker()
+        self.limiter = limiter
+        self._recent: deque[bool] = deque(maxlen=budget_window)  # True = hedge 를 띄운 요청
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.slot_denied = 0
+        self.wasted_input_tokens = 0
+        self.wasted_output_tokens = 0
+        self.wasted_tokens_estimated = 0
+
+    def trigger_delay(self) -> float | None:
+        p = self.latency.percentile(self.percentile)
+        return None if p is None else max(self.min_delay, p)
+
+    def _take_budget(self) -> bool:
+        if sum(self._recent) + 1 > self.budget_ratio * max(len(self._recent), 1):
+            self.budget_denied += 1
+            return False
+        return True
+
+    async def _take_slot(self) -> bool:
+        if self.limiter is None:
+            return True
+        if not await self.limiter.try_acquire():
+            self.slot_denied += 1
+            return False
+        return True
+
+    def _waste(self, loser: asyncio.Task, loser_started: float, winner: T, winner_elapsed: float):
+        if loser.done() and not loser.cancelled():
+            if loser.exception() is None:
+                input_tokens, output_tokens = self.tokens_of(loser.result())
+                self.wasted_input_tokens += input_tokens
+                self.wasted_output_tokens += output_tokens
+            return
+        # 취소된 쪽: 입력은 전부 과금됐다고 보고, 출력은 이긴 쪽 대비 진행 시간 비율로 추정
+        input_tokens, output_tokens = self.tokens_of(winner)
+        progress = min(1.0, (time.monotonic() - loser_started) / winner_elapsed) if winner_elapsed > 0 else 1.0
+        self.wasted_tokens_estimated += input_tokens + int(output_tokens * progress)
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        self.requests += 1
+        delay = self.trigger_delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        hedge: asyncio.Future | None = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._take_budget() and await self._take_slot():
+                    hedge = asyncio.ensure_future(call())
+                    if self.limiter is not None:
+                        hedge.add_done_callback(lambda _: self.limiter.release())
+
+            self._recent.append(hedge is not None)
+            if hedge is None:
+                result = await primary
+                self.latency.record(time.monotonic() - started)
+                return result
+
+            self.hedged += 1
+            starts = {primary: started, hedge: time.monotonic()}
+            pending = {primary, hedge}
+            first_error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary, hedge):  # 동시에 끝났으면 primary 우선
+                    if task not in done:
+                        continue
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                        continue
+                    result = task.result()
+                    elapsed = time.monotonic() - starts[task]
+                    self.latency.record(elapsed)
+                    if task is hedge:
+                        self.hedge_wins += 1
+                    loser = primary if task is hedge else hedge
+                    loser.cancel()
+                    self._waste(loser, starts[loser], result, elapsed)
+                    return result
+            raise first_error
+        finally:
+            # 이긴 쪽이 정해졌거나 호출한 쪽이 취소된 경우 남은 호출 정리
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_ratio": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "slot_denied": self.slot_denied,
+            "trigger_delay_seconds": self.trigger_delay(),
+            "wasted_input_tokens": self.wasted_input_tokens,
+            "wasted_output_tokens": self.wasted_output_tokens,
+            "wasted_tokens_estimated": self.wasted_tokens_estimated,
+        }
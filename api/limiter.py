@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """동시 실행 한도 + 대기열이 가득 차서 요청을 받을 수 없을 때"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    LLM 호출 동시 실행 수를 semaphore 로 제한한다.
+    - 대기 중인 요청이 max_waiting 이상이면 바로 429
+    - queue_timeout 안에 자리가 안 나면 503
+    대기열이 끝없이 쌓이는 대신 빨리 거절해서 클라이언트가 재시도하게 한다.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self):
+        if self._sem.locked():
+            if self._waiting >= self.max_waiting:
+                raise Overloaded(429, "요청이 너무 많아. 잠시 후 다시 시도해줘.")
+
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded(503, "서버가 바빠서 응답을 시작하지 못했어.", retry_after=int(self.queue_timeout) or 1)
+            finally:
+                self._waiting -= 1
+        else:
+            await self._sem.acquire()
+
+        self._in_flight += 1
+
+    async def try_acquire(self) -> bool:
+        # 기다리지 않고 빈 자리가 있을 때만 차지 (대기 중인 요청보다 앞서지 않음). hedge 같은 부가 호출용
+        if self._sem.locked() or self._waiting:
+            return False
+        await self._sem.acquire()  # locked() 가 아니면 바로 통과
+        self._in_flight += 1
+        return True
+
+    def release(self):
+        self._in_flight -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
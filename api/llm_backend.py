@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+
+# ==========================
+# 공통 인터페이스
+# ==========================
+
+@dataclass
+class LLMResult:
+    text: str
+    usage: Any = None  # input_tokens / output_tokens / input_tokens_details.cached_tokens
+
+
+@dataclass
+class StreamEvent:
+    type: str  # delta | completed | incomplete | failed
+    delta: str = ""
+    usage: Any = None
+
+
+class LLMBackend(ABC):
+    """
+    Responses API 모양의 params(dict)를 받아 텍스트를 돌려주는 LLM 호출 계층.
+    - complete(params)    : 한 번에 받기
+    - open_stream(params) : 스트림을 연 뒤(여기서 연결/상태 오류가 나면 바로 raise) 이벤트 iterator 반환
+    - warmup()            : 첫 요청 전에 미리 준비해 둘 것 (client 생성 등)
+    complete/open_stream 은 abstract 라 둘 중 하나라도 빠진 backend 는 만들 때 TypeError 가 난다.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    async def complete(self, params: dict) -> LLMResult:
+        ...
+
+    @abstractmethod
+    async def open_stream(self, params: dict) -> AsyncIterator[StreamEvent]:
+        ...
+
+    def warmup(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+# ==========================
+# OpenAI Responses API
+# ==========================
+
+class OpenAIResponsesBackend(LLMBackend):
+    """
+    client 는 make_client 로 처음 쓸 때(또는 warmup) 만든다.
+    openai SDK import 만 수백 ms 라 모듈 import 시점에 만들면 cold start 가 그만큼 느려진다.
+    """
+
+    name = "openai"
+
+    def __init__(self, make_client: Callable[[], Any], model: str):
+        super().__init__(model)
+        self._make_client = make_client
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._make_client()
+        return self._client
+
+    def warmup(self):
+        # client 생성 + responses 리소스 모듈 import 까지 (첫 호출에서 하던 일)
+        self.client.responses
+
+    async def complete(self, params: dict) -> LLMResult:
+        resp = await self.client.responses.create(**params)
+        return LLMResult(resp.output_text, resp.usage)
+
+    async def open_stream(self, params: dict) -> AsyncIterator[StreamEvent]:
+        stream = await self.client.responses.create(**params, stream=True)
+        return self._events(stream)
+
+    async def _events(self, stream) -> AsyncIterator[StreamEvent]:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield StreamEvent("delta", delta=event.delta)
+            elif event.type == "response.completed":
+                yield StreamEvent("completed", usage=event.response.usage)
+            elif event.type == "response.incomplete":
+                yield StreamEvent("incomplete")
+            elif event.type == "response.failed":
+                yield StreamEvent("failed")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+
+# ==========================
+# 로컬 stub (부하 테스트용)
+# ==========================
+
+class BackendError(Exception):
+    """stub 이 흉내 내는 upstream 오류 (status_code 는 retry.classify 가 그대로 사용)"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class StubUsage:
+    input_tokens: int
+    output_tokens: int
+    input_tokens_details: Any = None
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    "fixed:0.5" | "uniform:0.2,1.5" | "normal:0.8,0.2" | "lognormal:<median>,<sigma>" (초)
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def sample_from_schema(schema: dict, overrides: dict[str, Any], path: str = "") -> Any:
+    # strict json_schema 를 만족하는 가장 단순한 값. overrides 는 "a.b" 경로별로 값을 직접 지정
+    if path in overrides:
+        return overrides[path]
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            key: sample_from_schema(schema["properties"][key], overrides, f"{path}.{key}" if path else key)
+            for key in schema.get("required", schema.get("properties", {}))
+        }
+    if kind == "array":
+        count = min(max(schema.get("minItems", 0), 1), schema.get("maxItems", 1))
+        return [sample_from_schema(schema["items"], overrides, path) for _ in range(count)]
+    if kind == "number":
+        return schema.get("minimum", 0) + (schema.get("maximum", 1) - schema.get("minimum", 0)) / 2
+    if kind == "integer":
+        return schema.get("minimum", 0)
+    if kind == "boolean":
+        return False
+    return f"stub {path}"
+
+
+def _input_text(params: dict) -> str:
+    # input 은 문자열이거나 [{role, content: [{type, text}]}] 목록
+    items = params.get("input")
+    if isinstance(items, str):
+        return items
+    lines = []
+    for item in items or []:
+        content = item.get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content)
+        lines.append(str(content))
+    return "\n".join(lines)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 3)
+
+
+class StubBackend(LLMBackend):
+    """
+    네트워크/토큰 비용 없이 /chat 을 돌리는 stub.
+    - 같은 입력이면 같은 출력 (text.format 의 json_schema 가 있으면 그 스키마를 만족하는 JSON, 없으면 평문)
+    - latency 는 분포에서 샘플링, failure_rate 확률로 status_code 오류, truncate_rate 확률로 출력이 중간에 끊김
+    seed 를 주면 latency/실패 순서까지 재현된다.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency: Callable[[random.Random], float],
+        failure_rate: float = 0.0,
+        truncate_rate: float = 0.0,
+        failure_status: int = 503,
+        overrides: dict[str, Any] | None = None,
+        seed: int | None = None,
+        chunk_chars: int = 24,
+    ):
+        super().__init__("stub")
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.truncate_rate = truncate_rate
+        self.failure_status = failure_status
+        self.overrides = overrides or {}
+        self.chunk_chars = chunk_chars
+        self._rng = random.Random(seed)
+
+    def _render(self, params: dict) -> str:
+        text = _input_text(params)
+        last = text.strip().splitlines()[-1] if text.strip() else ""
+        digest = hashlib.sha1(f"{params.get('instructions', '')}\n{text}".encode("utf-8")).hexdigest()[:8]
+        reply = f"(stub {digest}) {last[:60]} 얘기 잘 들었어."
+
+        fmt = (params.get("text") or {}).get("format") or {}
+        if fmt.get("type") != "json_schema":
+            return reply
+        data = sample_from_schema(fmt["schema"], {"assistant_message": reply, **self.overrides})
+        return json.dumps(data, ensure_ascii=False)
+
+    async def _start(self, params: dict) -> tuple[float, str, bool]:
+        # (전체 latency, 출력 텍스트, 잘림 여부)
+        latency = self.latency(self._rng)
+        if self._rng.random() < self.failure_rate:
+            await asyncio.sleep(latency * 0.2)  # 오류는 보통 정상 응답보다 빨리 옴
+            raise BackendError(self.failure_status, "stub upstream error")
+        text = self._render(params)
+        truncated = self._rng.random() < self.truncate_rate
+        if truncated:
+            text = text[: self._rng.randint(1, max(1, len(text) - 1))]
+        return latency, text, truncated
+
+    def _usage(self, params: dict, text: str) -> StubUsage:
+        prompt = f"{params.get('instructions', '')}{_input_text(params)}"
+        return StubUsage(_approx_tokens(prompt), _approx_tokens(text))
+
+    async def complete(self, params: dict) -> LLMResult:
+        latency, text, _ = await self._start(params)
+        await asyncio.sleep(latency)
+        return LLMResult(text, self._usage(params, text))
+
+    async def open_stream(self, params: dict) -> AsyncIterator[StreamEvent]:
+        latency, text, truncated = await self._start(params)
+        # 첫 토큰까지 latency 의 30%, 나머지는 청크마다 나눠서
+        await asyncio.sleep(latency * 0.3)
+        return self._events(params, latency * 0.7, text, truncated)
+
+    async def _events(self, params: dict, remaining: float, text: str, truncated: bool) -> AsyncIterator[StreamEvent]:
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        step = remaining / len(chunks)
+        for chunk in chunks:
+            yield StreamEvent("delta", delta=chunk)
+            await asyncio.sleep(step)
+        if truncated:
+            yield StreamEvent("incomplete")
+        else:
+            yield StreamEvent("completed", usage=self._usage(params, text))
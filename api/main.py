@@ -1,17 +1,68 @@
-from fastapi import FastAPI
-import sqlite3
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import asyncio
+import gc
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, ValidationError
-from typing import List, Literal, Optional, Dict, Any
-import os, json
+from pydantic import BaseModel, PrivateAttr, ValidationError, field_validator
+from typing import AsyncIterator, Callable, List, Literal, Optional, Dict, Any
+import os
+import secrets
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
-import copy
-import re
+import time
 from dotenv import load_dotenv
+from rules_repo import ChatContext, LiveRulesReader, RulesRepository, RulesSnapshot, RulesValidationError
+from sqlite_pool import SQLitePool
+from prompt import PromptAssembler
+from metrics import ContextStats, UsageStats
+from context_window import ContextWindow
+from summarizer import SessionSummarizer
+from traits_merge import deep_merge
+from output_parse import TRUNCATION_REPAIRS, OutputParser
+from traits_patch import PatchResult, PatchValidator, apply_patches
+from response_cache import ResponseCache, Uncacheable, canonical_key
+from sessions import ChatSession, MemorySessionStore, SqliteSessionStore, SessionLocks
+from limiter import ConcurrencyLimiter, Overloaded
+from hedging import Hedger
+from llm_backend import LLMBackend, OpenAIResponsesBackend, StubBackend, parse_latency
+from retry import CircuitBreaker, DeadlineExceeded, RetryPolicy, RetryScheduler, classify
+from streaming import JsonStringFieldStreamer, sse_event
+from telemetry import Telemetry
 load_dotenv()
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # STARTUP_WARMUP=lifespan: 첫 요청 전에 rules 스냅샷을 읽어 풀어두고 LLM client 를 만들어 둔다
+    # (preload 로 fork 전에 읽어둔 스냅샷이 있으면 바뀌었을 때만 다시 읽어서 부모와 공유한 메모리를 유지)
+    # STARTUP_WARMUP=lazy: 둘 다 첫 요청이 처리될 때 만든다 (기동은 빠르지만 첫 요청이 그만큼 느림)
+    # rules.db 는 읽기만 한다 (WAL 전환은 writer 인 init_db.py 가 함)
+    if STARTUP_WARMUP == "lifespan":
+        with telemetry.span("startup_rules"):
+            try:
+                rules_repo.refresh_if_changed()
+            except RulesValidationError as e:
+                # preload 로 읽어둔 스냅샷이 있을 때만 여기로 옴 → 그걸 계속 사용
+                logger.warning("rules reload 실패 (기존 스냅샷 유지): %s", e)
+            rules_repo.snapshot.warm()
+        with telemetry.span("startup_llm_client"):
+            llm_backend.warmup()
+    watcher = asyncio.create_task(watch_rules_db())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+        await session_summarizer.drain()
+        await llm_backend.close()
+        response_cache.close()
+        session_store.close()
+        rules_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,10 +78,24 @@ app.add_middleware(
 
 Role = Literal["user", "assistant"]
 DB_PATH = Path(os.environ.get("RULES_DB_PATH", "rules.db"))
-ALLOWED_PATCH_PREFIXES = ("user.", "partner.", "context.", "signals.")
-
-# user.xxx / partner.xxx 같은 점(.) 경로만 허용 (최대 8 depth)
-PATCH_KEY_RE = re.compile(r"^(user|partner|context|signals)(\.[a-zA-Z0-9_]+){1,8}$")
+# init_db.py 가 만드는 컴파일된 스냅샷 (빈 문자열이면 사용 안 함, 없거나 stale 이면 DB 에서 읽음)
+RULES_SNAPSHOT_PATH = os.environ.get("RULES_SNAPSHOT_PATH", str(DB_PATH.with_suffix(".snap")))
+# snapshot: 메모리 스냅샷에서 읽음 (기본) / live: 매번 커넥션 풀로 DB 를 읽음 (스냅샷 교체를 기다릴 수 없을 때)
+RULES_READ_MODE = os.environ.get("RULES_READ_MODE", "snapshot")
+RULES_POOL_SIZE = int(os.environ.get("RULES_POOL_SIZE", "4"))
+RULES_RELOAD_INTERVAL = float(os.environ.get("RULES_RELOAD_INTERVAL", "5"))
+# /admin/* 호출에 필요한 X-Admin-Token 값 (없으면 admin 엔드포인트 비활성화)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "lifespan")  # lifespan | lazy
+PROMPT_LAYOUT = os.environ.get("PROMPT_LAYOUT", "cache_prefix")  # cache_prefix | classic
+# 히스토리는 메시지 개수가 아니라 토큰 예산으로 자른다 (넘친 앞부분은 요약으로 대체)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_SUMMARY_BUDGET = int(os.environ.get("CONTEXT_SUMMARY_BUDGET", "400"))
+
+# updated_traits_patch 항목 제한 (value_json 길이/중첩 깊이/노드 수)
+PATCH_VALUE_MAX_CHARS = int(os.environ.get("PATCH_VALUE_MAX_CHARS", "4000"))
+PATCH_VALUE_MAX_DEPTH = int(os.environ.get("PATCH_VALUE_MAX_DEPTH", "6"))
+PATCH_VALUE_MAX_NODES = int(os.environ.get("PATCH_VALUE_MAX_NODES", "200"))
 
 
 class ChatMessage(BaseModel):
@@ -49,132 +114,294 @@ class ChatRequest(BaseModel):
     relationship_type: Optional[str] = None
     relationship_state: Optional[str] = None
     traits_profile: Optional[TraitsProfile] = None
+    # 지정하면 서버가 updated_traits_patch 를 traits_profile 에 적용한 결과를 같이 돌려줌
+    # state: 갱신된 traits_profile 전체 / diff: 실제로 바뀐 경로만
+    traits_response: Optional[Literal["state", "diff"]] = None
 
 class ChatResponse(BaseModel):
     assistant_message: str
     analysis_json: Dict[str, Any]
 
+class LLMChatOutput(ChatResponse):
+    # LLM 출력 검증용: analysis_json 에 CHAT_SCHEMA 필수 키가 다 있어야 유효 (잘린 JSON 을 닫기만 한 결과는 여기서 걸림)
+    _truncated: bool = PrivateAttr(default=False)  # 잘림 보정으로 살린 결과 → 캐시하지 않음
+
+    @field_validator("analysis_json")
+    @classmethod
+    def require_analysis_keys(cls, value: Dict[str, Any]) -> Dict[str, Any]:
+        missing = [key for key in ANALYSIS_REQUIRED_KEYS if key not in value]
+        if missing:
+            raise ValueError(f"analysis_json 필수 키 누락: {', '.join(missing)}")
+        return value
+
+    @property
+    def cacheable(self) -> bool:
+        return not self._truncated
+
+class ChatTurnResponse(ChatResponse):
+    traits_profile: Optional[TraitsProfile] = None
+    traits_diff: Optional[Dict[str, Any]] = None
+
+class CreateSessionRequest(BaseModel):
+    mbti: Optional[str] = None
+    relationship_type: Optional[str] = None
+    relationship_state: Optional[str] = None
+    traits_profile: Optional[TraitsProfile] = None
+    messages: List[ChatMessage] = []  # 기존 대화를 이어서 세션을 만들 때
+
+class SessionChatRequest(BaseModel):
+    message: str
+
+class SessionInfo(BaseModel):
+    session_id: str
+    mbti: Optional[str] = None
+    relationship_type: Optional[str] = None
+    relationship_state: Optional[str] = None
+    traits_profile: Optional[TraitsProfile] = None
+    messages: List[ChatMessage]
+    summary: Optional[str] = None
+
+class SessionChatResponse(ChatTurnResponse):
+    pass
+
 
 # ==========================
 # OpenAI 설정
 # ==========================
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_WAITING = int(os.environ.get("LLM_MAX_WAITING", "64"))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+
+# 재시도 정책 (SDK 자체 재시도는 끄고 여기서만 재시도)
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "4"))
+LLM_DEADLINE = float(os.environ.get("LLM_DEADLINE", "45"))
+# 최근 LLM_BREAKER_WINDOW 건 중 실패율이 LLM_BREAKER_FAILURE_RATIO 이상이면 LLM_BREAKER_COOLDOWN 초 동안 바로 503
+LLM_BREAKER_WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", "50"))
+LLM_BREAKER_MIN_REQUESTS = int(os.environ.get("LLM_BREAKER_MIN_REQUESTS", "10"))
+LLM_BREAKER_FAILURE_RATIO = float(os.environ.get("LLM_BREAKER_FAILURE_RATIO", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "10"))
+
+# openai: 실제 Responses API / stub: 네트워크 없이 스키마에 맞는 출력을 돌려주는 부하 테스트용
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "openai")
+LLM_STUB_LATENCY = os.environ.get("LLM_STUB_LATENCY", "lognormal:0.8,0.4")  # fixed/uniform/normal/lognormal
+LLM_STUB_FAILURE_RATE = float(os.environ.get("LLM_STUB_FAILURE_RATE", "0"))
+LLM_STUB_TRUNCATE_RATE = float(os.environ.get("LLM_STUB_TRUNCATE_RATE", "0"))
+LLM_STUB_SEED = os.environ.get("LLM_STUB_SEED")
+
+# stub 이 내보내는 patch (경로 패턴이 있어서 스키마에서 자동으로 만들 수 없음)
+STUB_TRAITS_PATCH = [{"path": "context.memory.patterns", "value_json": '["(stub) 연락 패턴"]'}]
+
+
+def create_llm_backend() -> LLMBackend:
+    if LLM_BACKEND == "stub":
+        return StubBackend(
+            latency=parse_latency(LLM_STUB_LATENCY),
+            failure_rate=LLM_STUB_FAILURE_RATE,
+            truncate_rate=LLM_STUB_TRUNCATE_RATE,
+            overrides={"analysis_json.updated_traits_patch": STUB_TRAITS_PATCH},
+            seed=int(LLM_STUB_SEED) if LLM_STUB_SEED else None,
+        )
+    if LLM_BACKEND != "openai":
+        raise ValueError(f"unknown LLM_BACKEND: {LLM_BACKEND}")
+
+    def make_client():
+        # openai SDK / httpx 는 import 가 무거워서 client 를 실제로 만들 때 가져온다
+        import httpx
+        from openai import AsyncOpenAI
+
+        # 모든 요청이 하나의 keep-alive 커넥션 풀을 공유
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+        )
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+
+    return OpenAIResponsesBackend(make_client, MODEL)
+
+
+llm_backend = create_llm_backend()
+llm_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_WAITING, LLM_QUEUE_TIMEOUT)
+llm_breaker = CircuitBreaker(
+    window=LLM_BREAKER_WINDOW,
+    min_requests=LLM_BREAKER_MIN_REQUESTS,
+    failure_ratio=LLM_BREAKER_FAILURE_RATIO,
+    cooldown=LLM_BREAKER_COOLDOWN,
+)
+# tail latency 용 hedged request (기본 꺼짐). 최근 latency 의 LLM_HEDGE_PERCENTILE 분위수를 넘기면 한 번 더 보냄
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "90"))
+LLM_HEDGE_BUDGET = float(os.environ.get("LLM_HEDGE_BUDGET", "0.1"))  # 최근 요청 중 hedge 를 띄울 수 있는 최대 비율
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "1.0"))
+
+
+def usage_tokens(result: tuple[ChatResponse, Any]) -> tuple[int, int]:
+    usage = result[1]
+    if usage is None:
+        return 0, 0
+    return usage.input_tokens or 0, usage.output_tokens or 0
+
+
+llm_hedger = Hedger(
+    usage_tokens,
+    percentile=LLM_HEDGE_PERCENTILE,
+    budget_ratio=LLM_HEDGE_BUDGET,
+    min_delay=LLM_HEDGE_MIN_DELAY,
+    limiter=llm_limiter,  # hedge 도 LLM_MAX_CONCURRENCY 안에서만
+) if LLM_HEDGE_ENABLED else None
+llm_retry = RetryScheduler(
+    RetryPolicy(
+        max_attempts=LLM_MAX_ATTEMPTS,
+        base_delay=LLM_RETRY_BASE_DELAY,
+        max_delay=LLM_RETRY_MAX_DELAY,
+        deadline=LLM_DEADLINE,
+    ),
+    llm_breaker,
+)
+usage_stats = UsageStats()
+context_stats = ContextStats()
+# 단계별 소요 시간 histogram + /metrics (항상 켜 둠: 관측 한 번에 perf_counter 두 번 + bisect 한 번)
+telemetry = Telemetry()
+
+# 같은 입력(중복 전송/재시도)에 대한 응답 캐시. 크기 0 이면 비활성화
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")  # 지정하면 SQLite 에도 저장
+response_cache = ResponseCache(
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    Path(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None,
+)
 
-# ==========================
-# 유틸
-# ==========================
-
-def deep_merge(base: dict, state: dict):
-    merged = copy.deepcopy(base)
+# 대화 세션 (SESSION_STORE_PATH 를 지정하면 SQLite, 아니면 메모리 LRU)
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "10000"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(60 * 60 * 24)))
+SESSION_MAX_MESSAGES = int(os.environ.get("SESSION_MAX_MESSAGES", "200"))
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH")
+session_store = (
+    SqliteSessionStore(Path(SESSION_STORE_PATH), SESSION_TTL)
+    if SESSION_STORE_PATH else MemorySessionStore(SESSION_MAX, SESSION_TTL)
+)
+session_locks = SessionLocks()
 
-    for k, v in state.items():
-        if isinstance(v, dict) and k in merged:
-            merged[k] = deep_merge(merged.get(k, {}), v)
-        else:
-            merged[k] = v
-    return merged
+# 창 밖으로 밀려난 세션 히스토리를 LLM 으로 한 턴씩 요약에 접어 넣음 (0 이면 로컬 추출 요약만 사용)
+SUMMARY_ENABLED = os.environ.get("SUMMARY_ENABLED", "1") == "1"
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", llm_backend.model)
+SUMMARY_MAX_CHARS = int(os.environ.get("SUMMARY_MAX_CHARS", "800"))
 
 
-def merge_traits(req: ChatRequest) -> dict:
-    # 1) mbti 결정 우선순위: req.mbti > req.traits_profile.type
-    mbti = (req.mbti or (req.traits_profile.type if req.traits_profile else None))
+def session_overflow(messages: list[dict]) -> int:
+    return context_window.fit([ChatMessage.model_construct(**m) for m in messages]).dropped_count
 
-    # 2) DB에서 기본 프로필 로드
-    mbti_base = fetch_mbti_profile(mbti)
 
-    # 3) 프론트에서 넘어온 traits_profile(base/state) 합치기
-    user_traits = {}
-    if req.traits_profile:
-        user_traits = deep_merge(req.traits_profile.base or {}, req.traits_profile.state or {})
+async def complete_summary(instructions: str, input_text: str) -> str:
+    started = time.perf_counter()
+    result = await llm_backend.complete(dict(
+        model=SUMMARY_MODEL,
+        instructions=instructions,
+        input=input_text,
+        temperature=0.2,
+        max_output_tokens=600,
+    ))
+    telemetry.observe("upstream_summary", time.perf_counter() - started)
+    return result.text
 
-    # 4) MBTI 기본값 위에 user_traits가 덮어쓰게 병합
-    merged = deep_merge(mbti_base, user_traits)
-    return merged
 
-PATCH_ITEM_EXAMPLE = '{"path":"context.memory.patterns","value_json":"[\\"연락이 줄어들면 불안해함\\"]"}'
-VALUE_JSON_EXAMPLE = 'true -> "true", 3 -> "3", {"a":1} -> "{\\"a\\":1}"'
+session_summarizer = SessionSummarizer(
+    session_store,
+    session_locks,
+    count_overflow=session_overflow,
+    complete=complete_summary,
+    max_chars=SUMMARY_MAX_CHARS,
+)
 
 
-def build_instructions(req: ChatRequest, merged_traits: dict) -> str:
-    type_rules = fetch_relationship_type_rules(req.relationship_type)
-    state_rules = fetch_relationship_state_rules(req.relationship_state)
+# ==========================
+# 유틸
+# ==========================
 
-    return f"""
-너는 1급 심리 상담사이자 연애/관계 분석 전문가야.
-상대방의 MBTI 성향과 현재 관계 상태의 특성을 기반으로, 내담자(사용자)의 불안함을 달래주고 날카로운 통찰을 제공해야 해.
+def resolve_mbti(req: ChatRequest) -> str | None:
+    # mbti 결정 우선순위: req.mbti > req.traits_profile.type
+    return req.mbti or (req.traits_profile.type if req.traits_profile else None)
 
-[상대방의 성향(MBTI 등) 데이터]
-{json.dumps(merged_traits, ensure_ascii=False)}
 
-[현재 관계 유형 규칙]
-{json.dumps(type_rules, ensure_ascii=False)}
+@telemetry.timed("merge_user_traits")
+def merge_user_traits(req: ChatRequest) -> dict:
+    # 프론트에서 넘어온 traits_profile(base/state) 합치기 (결과는 입력과 하위 트리를 공유하므로 읽기 전용)
+    if not req.traits_profile:
+        return {}
+    return deep_merge(req.traits_profile.base or {}, req.traits_profile.state or {})
 
-[현재 관계 상태 규칙]
-{json.dumps(state_rules, ensure_ascii=False)}
 
-======================
-assistant_message 작성 규칙 (핵심)
-======================
-사용자가 직접 읽는 답변이야. 절대 기계적으로 짧게 끝내지마.
-다음 흐름으로 3~4 문단의 풍부한 대답을 작성해:
-1. 공감 : 사용자의 현재 감정을 부드럽게 읽어주고 안심시킬 것.
-2. 성향 기반 분석 : 위 데이터의 'core_drives'나 'communication' 특징을 직접 언급하며 상대방의 행동이 왜 무관심이 아니라 그들만의 방식인지 설명할 것. (예 : "ISTP는 원래 에너지가 낮아서...")
-3) 근거 없는 MBTI 단정 금지. certainty가 low면 반드시 대안 후보 제시.
-4. 역질문: 대화를 이어가거나 추가 단서를 얻기 위해, 상황에 맞는 구체적인 질문 1개를 마지막에 던질 것.
+PATCH_ITEM_EXAMPLE = '{"path":"context.memory.patterns","value_json":"[\\"연락이 줄어들면 불안해함\\"]"}'
+VALUE_JSON_EXAMPLE = 'true -> "true", 3 -> "3", {"a":1} -> "{\\"a\\":1}"'
 
-* 금지사항: JSON 분석 내용을 그대로 복붙하지 말 것. 딱딱한 말투 금지.
 
-""".strip()
+@telemetry.timed("build_instructions")
+def build_instructions(ctx: ChatContext, user_traits: dict, summary: str | None = None) -> str:
+    # 기본 프로필/규칙 조각은 캐시된 문자열을 쓰고, 요청마다 직렬화하는 건 user_traits 뿐
+    return prompt_assembler.build(ctx, user_traits, summary)
 
+@telemetry.timed("filter_updated_traits_patch")
 def filter_updated_traits_patch(patch) -> list[dict]:
     """
     LLM이 준 updated_traits_patch(list)를 검증/정리해서
     [{path: "...", value: <parsed>}, ...] 형태로 반환
     """
-    if not isinstance(patch, list):
-        return []
+    return patch_validator.filter(patch)
 
-    filtered: list[dict] = []
-    for item in patch:
-        if not isinstance(item, dict):
-            continue
-
-        path = item.get("path")
-        value_json = item.get("value_json")
+def apply_traits_patch(traits_profile: dict, patch: list[dict]) -> tuple[dict, PatchResult]:
+    """
+    filter_updated_traits_patch 결과를 traits_profile.state 에 한 번에 적용.
+    새 traits_profile 과 (diff/conflict 가 담긴) PatchResult 를 반환한다.
+    """
+    result = apply_patches(traits_profile.get("state") or {}, patch)
+    return {**traits_profile, "state": result.state}, result
 
-        if not isinstance(path, str) or not isinstance(value_json, str):
-            continue
 
-        path = path.strip()
+def with_traits_response(req: ChatRequest, response: dict) -> dict:
+    # traits_response 를 요청한 경우에만 patch 적용 결과를 붙임 (캐시된 응답 dict 는 건드리지 않음)
+    if not req.traits_response or req.traits_profile is None:
+        return response
 
-        # prefix 체크 + 패턴 체크
-        if not path.startswith(ALLOWED_PATCH_PREFIXES):
-            continue
-        if not PATCH_KEY_RE.match(path):
-            continue
+    patch = (response.get("analysis_json") or {}).get("updated_traits_patch") or []
+    updated, result = apply_traits_patch(req.traits_profile.model_dump(), patch)
+    if req.traits_response == "diff":
+        return {**response, "traits_diff": result.diff_payload()}
+    return {**response, "traits_profile": updated}
 
-        # value_json은 반드시 JSON 문자열이어야 함
-        try:
-            value = json.loads(value_json)
-        except Exception:
-            continue
 
-        # 직렬화 가능 확인
-        try:
-            json.dumps(value, ensure_ascii=False)
-        except Exception:
-            continue
+def traits_events(response: dict) -> dict:
+    # with_traits_response 결과를 SSE 이벤트로
+    if "traits_diff" in response:
+        return {"traits_diff": response["traits_diff"]}
+    if "traits_profile" in response:
+        return {"traits": response["traits_profile"]}
+    return {}
 
-        filtered.append({"path": path, "value": value})
 
-    return filtered
+def initial_traits_profile(mbti: str) -> dict:
+    # page.tsx 가 MBTI 선택 시 만들던 초기값과 동일
+    return {
+        "type": mbti,
+        "base": {},
+        "state": {"context": {"memory": {"timeline": [], "patterns": []}}},
+        "evidence": [],
+    }
 
+@telemetry.timed("to_responses_input")
 def to_responses_input(messages: List[ChatMessage]):
+    # 어디까지 보낼지는 context_window 가 정함 (여기서는 변환만)
     items = []
-    for m in messages[-20:]:  # ← 버그 수정 (슬라이싱)
+    for m in messages:
         content_type = "output_text" if m.role == "assistant" else "input_text"
         items.append({
             "role": m.role,
@@ -182,72 +409,82 @@ def to_responses_input(messages: List[ChatMessage]):
         })
     return items
 
-def fetch_relationship_type_rules(type_code: str | None) -> dict:
-    if not type_code:
-        return {"type_code": None, "display_name": None, "rules": []}
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT display_name, rules_json
-        FROM relationship_type_modifiers
-        WHERE type_code=? AND is_active=1
-        LIMIT 1
-    """, (type_code,))
-    row = cur.fetchone()
-    conn.close()
-
-    if not row:
-        return {"type_code": type_code, "display_name": None, "rules": []}
-
-    display_name, rules_json = row
-    payload = json.loads(rules_json)
-    return {"type_code": type_code, "display_name": display_name, "rules": payload.get("rules", [])}
-
-
-def fetch_relationship_state_rules(state_code: str | None) -> dict:
-    if not state_code:
-        return {"state_code": None, "display_name": None, "rules": []}
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT display_name, rules_json
-        FROM relationship_state_modifiers
-        WHERE state_code=? AND is_active=1
-        LIMIT 1
-    """, (state_code,))
-    row = cur.fetchone()
-    conn.close()
-
-    if not row:
-        return {"state_code": state_code, "display_name": None, "rules": []}
-
-    display_name, rules_json = row
-    payload = json.loads(rules_json)
-    return {"state_code": state_code, "display_name": display_name, "rules": payload.get("rules", [])}
-
-def fetch_mbti_profile(mbti: str | None) -> dict:
-    if not mbti:
-        return {}
+# ==========================
+# RULES (메모리 스냅샷)
+# ==========================
 
-    mbti = mbti.upper().strip()
+rules_pool = SQLitePool(DB_PATH, size=RULES_POOL_SIZE)
+rules_repo = RulesRepository(DB_PATH, rules_pool, Path(RULES_SNAPSHOT_PATH) if RULES_SNAPSHOT_PATH else None)
+live_rules = LiveRulesReader(rules_pool) if RULES_READ_MODE == "live" else None
+prompt_assembler = PromptAssembler(layout=PROMPT_LAYOUT)
+context_window = ContextWindow(CONTEXT_TOKEN_BUDGET, CONTEXT_SUMMARY_BUDGET)
+output_parser = OutputParser(LLMChatOutput)
+patch_validator = PatchValidator(
+    max_items=20,
+    max_value_chars=PATCH_VALUE_MAX_CHARS,
+    max_depth=PATCH_VALUE_MAX_DEPTH,
+    max_nodes=PATCH_VALUE_MAX_NODES,
+)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT profile_json
-        FROM mbti_profiles
-        WHERE mbti=? AND is_active=1
-        LIMIT 1
-    """, (mbti,))
-    row = cur.fetchone()
-    conn.close()
 
-    if not row:
-        return {}
+# watcher 와 /admin/rules/reload 가 동시에 reload 하지 않도록
+rules_reload_lock = asyncio.Lock()
+
+
+async def reload_rules(force: bool = False) -> Optional[dict]:
+    """
+    새 스냅샷은 스레드에서 읽고 검증한 뒤 교체한다 (그동안 요청은 기존 스냅샷으로 처리).
+    교체되면 내용이 바뀐 코드가 들어간 응답 캐시 항목만 지운다. 프롬프트 조각은
+    PromptAssembler 가 새 스냅샷을 처음 볼 때 같은 기준으로 지운다.
+    바뀐 게 없으면 None, 검증에 실패하면 RulesValidationError (기존 스냅샷 유지).
+    """
+    async with rules_reload_lock:
+        if force:
+            changes = await asyncio.to_thread(rules_repo.reload)
+        elif await asyncio.to_thread(rules_repo.refresh_if_changed):
+            changes = rules_repo.last_changes
+        else:
+            return None
+        dropped = await response_cache.invalidate(rules_cache_tags(changes))
+        logger.info("rules reload: %s (응답 캐시 %d개 삭제)", changes or "내용 변경 없음", dropped)
+        return {"changes": changes, "response_cache_invalidated": dropped}
+
+
+async def watch_rules_db():
+    # mtime + version fingerprint 를 주기적으로 확인 (init_db.py 가 커밋하면 다음 주기에 반영)
+    while True:
+        await asyncio.sleep(RULES_RELOAD_INTERVAL)
+        try:
+            await reload_rules()
+        except RulesValidationError as e:
+            logger.warning("rules reload 실패 (기존 스냅샷 유지): %s", e)
+        except Exception:
+            # 읽기 실패 시 기존 스냅샷을 계속 사용
+            logger.warning("rules reload 실패 (기존 스냅샷 유지)", exc_info=True)
+
+
+def preload():
+    """
+    멀티 프로세스 실행(serve.py / gunicorn preload_app)에서 fork 전에 부모가 한 번 호출.
+    스냅샷을 부모가 읽어두면 worker 들은 copy-on-write 로 같은 메모리를 읽기 전용으로 공유한다.
+    gc.freeze 로 지금까지의 객체를 GC 대상에서 빼서 worker 의 GC 가 공유 페이지를 건드리지 않게 한다.
+    (reload 로 스냅샷이 바뀌면 그 뒤로는 worker 마다 따로 들고 있게 됨)
+    """
+    rules_repo.load().warm()
+    gc.collect()
+    gc.freeze()
+
+
+def rules_source() -> RulesSnapshot | LiveRulesReader:
+    return live_rules if live_rules is not None else rules_repo.snapshot
+
+
+@telemetry.timed("load_chat_context")
+def load_chat_context(req: ChatRequest) -> ChatContext:
+    # 프로필 + 관계 유형/상태 규칙을 한 번에 (스냅샷이면 dict 조회 3번, live 면 쿼리 1번)
+    # build_instructions 는 이 ctx 만 보고, 규칙/프로필을 따로 다시 조회하는 경로는 없다
+    return rules_source().chat_context(resolve_mbti(req), req.relationship_type, req.relationship_state)
 
-    return json.loads(row[0])
 
 # ==========================
 # JSON SCHEMA
@@ -391,59 +628,531 @@ CHAT_SCHEMA = {
     }
 }
 
+ANALYSIS_REQUIRED_KEYS = tuple(CHAT_SCHEMA["properties"]["analysis_json"]["required"])
+
 # ==========================
 # LLM 호출
 # ==========================
 
-def call_llm_chat(req: ChatRequest) -> ChatResponse:
-    merged_traits = merge_traits(req)
-    instructions = build_instructions(req, merged_traits)
-    input_items = to_responses_input(req.messages)
-
-    resp = client.responses.create(
-    model=MODEL,
-    instructions=instructions,
-    input=input_items,
-    text={
-        "format": {
-            "type": "json_schema",
-            "name": "chat_response",   # ✅ 여기로 올라와야 함
-            "schema": CHAT_SCHEMA,     # ✅ 여기로 올라와야 함
-            "strict": True             # ✅ 여기로 올라와야 함
-        }
-    },
-    temperature=0.7,
-    max_output_tokens=1000,
-)
+LLM_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "chat_response",   # ✅ 여기로 올라와야 함
+        "schema": CHAT_SCHEMA,     # ✅ 여기로 올라와야 함
+        "strict": True             # ✅ 여기로 올라와야 함
+    }
+}
 
-    raw = resp.output_text
-    data = json.loads(raw)
-    analysis = data.get("analysis_json") or {}
-    patch = analysis.get("updated_traits_patch")
-    analysis["updated_traits_patch"] = filter_updated_traits_patch(patch)
-    data["analysis_json"] = analysis
 
-    return ChatResponse.model_validate(data)
+def build_llm_params(req: ChatRequest, summary: str | None = None) -> dict:
+    """summary: 세션에 저장된 이전 대화 요약 (있으면 창 밖 메시지 요약 앞에 붙임)"""
+    with telemetry.span("context_window"):
+        window = context_window.fit(req.messages)
+    context_stats.record(window.tokens_before, window.tokens_after, window.dropped_count)
+
+    summary = "\n".join(s for s in (summary, window.summary) if s) or None
+    ctx = load_chat_context(req)
+    user_traits = merge_user_traits(req)
+    instructions = build_instructions(ctx, user_traits, summary)
+    input_items = to_responses_input(window.messages)
+
+    return dict(
+        model=llm_backend.model,
+        instructions=instructions,
+        input=input_items,
+        text=LLM_TEXT_FORMAT,
+        temperature=0.7,
+        max_output_tokens=1000,
+    )
+
+
+def parse_llm_output(raw: str) -> LLMChatOutput:
+    # JSON 파싱 + 타입 검증을 한 번에 (깨진 JSON 은 로컬 보정 후 재시도)
+    with telemetry.span("parse_output"):
+        result, kind = output_parser.parse_with_kind(raw)
+    result._truncated = kind in TRUNCATION_REPAIRS
+    analysis = result.analysis_json
+    analysis["updated_traits_patch"] = filter_updated_traits_patch(analysis.get("updated_traits_patch"))
+    return result
+
+
+async def request_llm_chat(params: dict) -> tuple[LLMChatOutput, Any]:
+    started = time.perf_counter()
+    resp = await llm_backend.complete(params)
+    elapsed = time.perf_counter() - started
+    telemetry.observe("upstream_complete", elapsed)
+    usage_stats.record(resp.usage, elapsed)
+    return parse_llm_output(resp.text), resp.usage
+
+
+async def call_llm_chat(req: ChatRequest, summary: str | None = None) -> LLMChatOutput:
+    params = build_llm_params(req, summary)
+    if llm_hedger is None:
+        result, _ = await request_llm_chat(params)
+    else:
+        # 느린 호출이면 같은 params 로 한 번 더 보내고 먼저 끝난 쪽을 씀
+        result, _ = await llm_hedger.run(lambda: request_llm_chat(params))
+    return result
+
+
+async def stream_llm_chat(req: ChatRequest, on_complete=None, summary: str | None = None):
+    """
+    SSE 이벤트 문자열을 순서대로 yield
+    - delta    : assistant_message 가 생성되는 대로 {"text": "..."}
+    - analysis : JSON 이 완성되고 patch 필터까지 끝난 analysis_json
+    - error    : 실패 시 {"message": "..."}
+    - done     : 항상 마지막
+    """
+    streamer = JsonStringFieldStreamer("assistant_message")
+    chunks: list[str] = []
+    try:
+        params = build_llm_params(req, summary)
+        started = time.perf_counter()
+        # 재시도는 스트림을 여는 단계까지만 (delta 를 보내기 시작한 뒤에는 되돌릴 수 없음)
+        stream = await llm_retry.run(lambda: llm_backend.open_stream(params))
+        async for event in stream:
+            if event.type == "delta":
+                if not chunks:
+                    telemetry.observe("upstream_first_token", time.perf_counter() - started)
+                chunks.append(event.delta)
+                text = streamer.feed(event.delta)
+                if text:
+                    yield sse_event("delta", {"text": text})
+            elif event.type == "completed":
+                elapsed = time.perf_counter() - started
+                telemetry.observe("upstream_stream", elapsed)
+                usage_stats.record(event.usage, elapsed)
+            elif event.type in ("failed", "incomplete"):
+                # incomplete(max_output_tokens 도달 등)는 아래 파싱 단계에서 잘린 JSON 보정을 시도
+                break
+
+        result = parse_llm_output("".join(chunks))
+        if not streamer.done:
+            # 스트리밍 도중 못 뽑았으면 완성본으로 한 번에 보냄
+            yield sse_event("delta", {"text": result.assistant_message})
+        yield sse_event("analysis", result.analysis_json)
+        if on_complete is not None:
+            # on_complete 가 돌려준 {event: data} 는 done 전에 추가로 보냄
+            extra = await on_complete(result)
+            for name, data in (extra or {}).items():
+                yield sse_event(name, data)
+    except (ValidationError, DeadlineExceeded):
+        yield sse_event("error", {"message": "응답 생성 실패"})
+    except Overloaded as e:
+        yield sse_event("error", {"message": e.detail})
+    except Exception as e:
+        # 재시도할 수 있는 upstream 오류를 끝까지 못 넘긴 경우는 내부 메시지를 노출하지 않음
+        message = "응답 생성 실패" if classify(e) is not None else f"에러 발생: {str(e)}"
+        yield sse_event("error", {"message": message})
+
+    yield sse_event("done", {})
 
 
 # ==========================
 # ENDPOINT
 # ==========================
 
-@app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    for _ in range(2):
+class ChatGenerationFailed(Exception):
+    pass
+
+
+def overloaded_http(e: Overloaded) -> HTTPException:
+    return HTTPException(e.status_code, e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    LLM limiter 자리를 잡은 채로 돌려주는 SSE 응답. 자리는 응답 전송이 끝날 때 한 번만 반납한다.
+    generator 의 finally 에서 반납하면 첫 chunk 전에 클라이언트가 끊었을 때 generator 가
+    시작조차 안 돼서 자리가 영영 반납되지 않는다 → __call__ 바깥에서 반납.
+    """
+
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+        self._released = False
+
+    def release_slot(self):
+        if not self._released:
+            self._released = True
+            self._release()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release_slot()
+
+
+async def llm_event_stream(events: AsyncIterator[str]) -> SlotStreamingResponse:
+    # 스트림 시작 전에 자리를 잡아야 429/503 을 HTTP 상태로 돌려줄 수 있음
+    try:
+        llm_breaker.reject_if_open()
+        await llm_limiter.acquire()
+    except Overloaded as e:
+        raise overloaded_http(e)
+    return SlotStreamingResponse(
+        events,
+        release=llm_limiter.release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def chat_cache_key(req: ChatRequest, summary: str | None = None) -> str:
+    # LLM 에 전달되는 값을 결정하는 입력만으로 키를 만든다
+    # (요약에 쓰이는 앞부분 메시지도 결과에 영향을 주므로 히스토리 전체를 포함)
+    mbti = resolve_mbti(req)
+    return canonical_key({
+        "model": llm_backend.model,
+        "layout": PROMPT_LAYOUT,
+        "context_budget": [CONTEXT_TOKEN_BUDGET, CONTEXT_SUMMARY_BUDGET],
+        "messages": [[m.role, m.content] for m in req.messages],
+        "summary": summary,
+        "mbti": mbti.upper().strip() if mbti else None,
+        "relationship_type": req.relationship_type,
+        "relationship_state": req.relationship_state,
+        "traits_profile": req.traits_profile.model_dump() if req.traits_profile else None,
+    })
+
+
+RULE_CACHE_TAG_PREFIXES = {
+    "mbti_profiles": "mbti",
+    "relationship_type_modifiers": "type",
+    "relationship_state_modifiers": "state",
+}
+
+
+def chat_cache_tags(req: ChatRequest) -> tuple[str, ...]:
+    # 응답이 의존하는 rules 코드 (rules reload 때 바뀐 코드의 항목만 지우는 데 씀)
+    mbti = resolve_mbti(req)
+    return (
+        f"mbti:{mbti.upper().strip() if mbti else None}",
+        f"type:{req.relationship_type}",
+        f"state:{req.relationship_state}",
+    )
+
+
+def rules_cache_tags(changes: dict[str, list[str]]) -> tuple[str, ...]:
+    return tuple(f"{RULE_CACHE_TAG_PREFIXES[table]}:{code}" for table, codes in changes.items() for code in codes)
+
+
+async def generate_chat(req: ChatRequest, summary: str | None = None) -> dict | Uncacheable:
+    async with llm_limiter.slot():
         try:
-            return call_llm_chat(req)
-        except (ValidationError, json.JSONDecodeError):
-            continue
+            result = await llm_retry.run(lambda: call_llm_chat(req, summary))
+        except DeadlineExceeded as e:
+            raise ChatGenerationFailed() from e
         except Exception as e:
-            return {
-                "assistant_message": f"에러 발생: {str(e)}",
-                "analysis_json": {}
-            }
+            # 재시도 가능한 오류를 끝까지 못 넘긴 경우 (검증 실패/타임아웃/5xx 등)
+            if classify(e) is None:
+                raise
+            raise ChatGenerationFailed() from e
+    data = result.model_dump()
+    # 잘림 보정으로 살린 응답은 이번 요청에만 쓰고 TTL 동안 다시 내주지 않음
+    return data if result.cacheable else Uncacheable(data)
+
+
+@app.post("/chat", response_model=ChatTurnResponse, response_model_exclude_unset=True)
+async def chat(req: ChatRequest):
+    try:
+        result = await response_cache.get_or_compute(
+            chat_cache_key(req), lambda: generate_chat(req), chat_cache_tags(req)
+        )
+        return with_traits_response(req, result)
+    except Overloaded as e:
+        raise overloaded_http(e)
+    except ChatGenerationFailed:
+        return {
+            "assistant_message": "응답 생성 실패",
+            "analysis_json": {}
+        }
+    except Exception as e:
+        return {
+            "assistant_message": f"에러 발생: {str(e)}",
+            "analysis_json": {}
+        }
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    cache_key = chat_cache_key(req)
+    cache_generation = response_cache.generation
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        async def replay():
+            yield sse_event("delta", {"text": cached["assistant_message"]})
+            yield sse_event("analysis", cached["analysis_json"])
+            for name, data in traits_events(with_traits_response(req, cached)).items():
+                yield sse_event(name, data)
+            yield sse_event("done", {})
 
+        return StreamingResponse(replay(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def on_complete(result: LLMChatOutput):
+        data = result.model_dump()
+        if result.cacheable:
+            await response_cache.set(cache_key, data, chat_cache_tags(req), cache_generation)
+        return traits_events(with_traits_response(req, data))
+
+    return await llm_event_stream(stream_llm_chat(req, on_complete))
+
+
+# ==========================
+# SESSIONS
+# ==========================
+
+def session_info(session: ChatSession) -> SessionInfo:
+    return SessionInfo(
+        session_id=session.id,
+        mbti=session.mbti,
+        relationship_type=session.relationship_type,
+        relationship_state=session.relationship_state,
+        traits_profile=session.traits_profile,
+        messages=session.messages,
+        summary=session.summary,
+    )
+
+
+def get_session_or_404(session_id: str) -> ChatSession:
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(404, "세션이 없거나 만료됐어.")
+    return session
+
+
+def session_chat_request(session: ChatSession, message: str) -> ChatRequest:
+    return ChatRequest(
+        messages=[*session.messages, {"role": "user", "content": message}],
+        mbti=session.mbti,
+        relationship_type=session.relationship_type,
+        relationship_state=session.relationship_state,
+        traits_profile=session.traits_profile,
+    )
+
+
+def commit_session_turn(session: ChatSession, message: str, result: dict):
+    # 성공한 턴만 기록: 히스토리 추가 + patch 를 서버에서 traits 에 적용
+    messages = [
+        *session.messages,
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": result["assistant_message"]},
+    ]
+    session.messages = messages[-SESSION_MAX_MESSAGES:]
+
+    patch = (result.get("analysis_json") or {}).get("updated_traits_patch") or []
+    if patch and session.traits_profile is not None:
+        session.traits_profile, _ = apply_traits_patch(session.traits_profile, patch)
+
+    session_store.save(session)
+    if SUMMARY_ENABLED:
+        session_summarizer.schedule(session.id)
+
+
+@app.post("/sessions", response_model=SessionInfo)
+def create_session(req: CreateSessionRequest):
+    mbti = req.mbti or (req.traits_profile.type if req.traits_profile else None)
+    traits_profile = req.traits_profile.model_dump() if req.traits_profile else None
+    if traits_profile is None and mbti:
+        traits_profile = initial_traits_profile(mbti)
+
+    session = ChatSession(
+        id=ChatSession.new_id(),
+        mbti=mbti,
+        relationship_type=req.relationship_type,
+        relationship_state=req.relationship_state,
+        traits_profile=traits_profile,
+        messages=[m.model_dump() for m in req.messages][-SESSION_MAX_MESSAGES:],
+    )
+    session_store.save(session)
+    return session_info(session)
+
+
+@app.get("/sessions/{session_id}", response_model=SessionInfo)
+def read_session(session_id: str):
+    return session_info(get_session_or_404(session_id))
+
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    session_store.delete(session_id)
+    return {"ok": True}
+
+
+@app.post("/sessions/{session_id}/chat", response_model=SessionChatResponse, response_model_exclude_unset=True)
+async def session_chat(session_id: str, body: SessionChatRequest):
+    async with session_locks.hold(session_id):
+        session = get_session_or_404(session_id)
+        req = session_chat_request(session, body.message)
+
+        summary = session.summary
+        try:
+            result = await response_cache.get_or_compute(
+                chat_cache_key(req, summary), lambda: generate_chat(req, summary), chat_cache_tags(req)
+            )
+        except Overloaded as e:
+            raise overloaded_http(e)
+        except ChatGenerationFailed:
+            return {"assistant_message": "응답 생성 실패", "analysis_json": {}, "traits_profile": session.traits_profile}
+        except Exception as e:
+            return {"assistant_message": f"에러 발생: {str(e)}", "analysis_json": {}, "traits_profile": session.traits_profile}
+
+        commit_session_turn(session, body.message, result)
+        return {**result, "traits_profile": session.traits_profile}
+
+
+@app.post("/sessions/{session_id}/chat/stream")
+async def session_chat_stream(session_id: str, body: SessionChatRequest):
+    get_session_or_404(session_id)
+
+    async def events():
+        async with session_locks.hold(session_id):
+            session = session_store.get(session_id)
+            if session is None:
+                yield sse_event("error", {"message": "세션이 없거나 만료됐어."})
+                yield sse_event("done", {})
+                return
+
+            req = session_chat_request(session, body.message)
+
+            summary = session.summary
+            cache_generation = response_cache.generation
+
+            async def on_complete(result: LLMChatOutput):
+                data = result.model_dump()
+                if result.cacheable:
+                    await response_cache.set(chat_cache_key(req, summary), data, chat_cache_tags(req), cache_generation)
+                commit_session_turn(session, body.message, data)
+                return {"traits": session.traits_profile}
+
+            async for chunk in stream_llm_chat(req, on_complete, summary):
+                yield chunk
+
+    # limiter 자리 반납은 /chat/stream 과 같은 SlotStreamingResponse 가 맡음
+    return await llm_event_stream(events())
+
+
+@app.get("/stats/cache")
+def cache_stats():
+    return {"response_cache": response_cache.stats(), "prompt_fragments": {
+        "hits": prompt_assembler.hits,
+        "misses": prompt_assembler.misses,
+        "invalidated": prompt_assembler.invalidated,
+    }, "summarizer": session_summarizer.stats()}
+
+
+@app.get("/stats/usage")
+def usage():
+    return {
+        "pid": os.getpid(),  # 멀티 worker 에서는 worker 별 값
+        "llm_backend": llm_backend.name,
+        "prompt_layout": PROMPT_LAYOUT,
+        **usage_stats.snapshot(),
+        "context": {"token_budget": CONTEXT_TOKEN_BUDGET, "exact_tokenizer": context_window.counter.exact, **context_stats.snapshot()},
+        "output_parse": output_parser.stats(),
+        "retry": llm_retry.stats(),
+        "hedging": llm_hedger.stats() if llm_hedger is not None else None,
+        "traits_patch": patch_validator.stats(),
+        "rules": {"read_mode": RULES_READ_MODE, **rules_repo.stats()},
+    }
+
+
+# ==========================
+# ADMIN
+# ==========================
+
+def require_admin(token: str | None):
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Not Found")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(403, "admin token 이 올바르지 않아.")
+
+
+@app.post("/admin/rules/reload")
+async def admin_reload_rules(force: bool = False, x_admin_token: Optional[str] = Header(default=None)):
+    # init_db.py 실행 직후 watcher 주기를 기다리지 않고 반영 (force=true 면 변경 감지 없이 전부 다시 읽음)
+    # 멀티 worker 에서는 요청을 받은 worker 만 즉시 반영되고, 나머지는 각자의 watcher 가 반영한다
+    require_admin(x_admin_token)
+    if RULES_READ_MODE == "live":
+        raise HTTPException(409, "RULES_READ_MODE=live 에서는 스냅샷을 쓰지 않아.")
+    try:
+        result = await reload_rules(force)
+    except RulesValidationError as e:
+        logger.warning("rules reload 실패 (기존 스냅샷 유지): %s", e)
+        raise HTTPException(422, {"message": "검증 실패로 기존 rules 를 유지해.", "problems": e.problems})
     return {
-        "assistant_message": "응답 생성 실패",
-        "analysis_json": {}
-    }
\ No newline at end of file
+        "pid": os.getpid(),
+        "reloaded": result is not None,
+        "changes": result["changes"] if result else {},
+        "response_cache_invalidated": result["response_cache_invalidated"] if result else 0,
+        "rules": rules_repo.stats(),
+    }
+
+
+@telemetry.collector
+def collect_metrics():
+    usage = usage_stats.snapshot()
+    yield "llm_requests_total", "counter", "LLM 호출 수 (usage 기록 기준)", [({}, usage["requests"])]
+    yield "llm_tokens_total", "counter", "LLM 토큰 사용량", [
+        ({"kind": "input"}, usage["input_tokens"]),
+        ({"kind": "cached_input"}, usage["cached_input_tokens"]),
+        ({"kind": "output"}, usage["output_tokens"]),
+    ]
+
+    retry = llm_retry.stats()
+    yield "llm_attempts_total", "counter", "재시도 포함 LLM 호출 시도 수", [({}, retry["attempts"])]
+    yield "llm_retries_total", "counter", "사유별 재시도 수", [({"reason": r}, n) for r, n in retry["retries_by_reason"].items()]
+    yield "llm_retry_outcomes_total", "counter", "재시도 결과", [
+        ({"outcome": "recovered"}, retry["recovered"]),
+        ({"outcome": "gave_up"}, retry["gave_up"]),
+        ({"outcome": "deadline_exceeded"}, retry["deadline_exceeded"]),
+    ]
+    yield "llm_retry_added_seconds_total", "counter", "재시도로 늘어난 시간", [({}, retry["added_seconds_total"])]
+    circuit = retry["circuit"]
+    yield "llm_circuit_open", "gauge", "서킷 브레이커 상태 (0 closed, 1 open, 0.5 half_open)", [
+        ({}, {"closed": 0, "open": 1, "half_open": 0.5}[circuit["state"]])
+    ]
+    yield "llm_circuit_rejected_total", "counter", "서킷이 열려서 거절한 요청", [({}, circuit["rejected"])]
+    yield "llm_in_flight", "gauge", "LLM 동시 실행/대기 수", [
+        ({"state": "running"}, llm_limiter.in_flight),
+        ({"state": "waiting"}, llm_limiter.waiting),
+    ]
+
+    cache = response_cache.stats()
+    yield "cache_lookups_total", "counter", "캐시 조회 결과", [
+        ({"cache": "response", "result": "hit"}, cache["hits"]),
+        ({"cache": "response", "result": "miss"}, cache["misses"]),
+        ({"cache": "response", "result": "coalesced"}, cache["coalesced"]),
+        ({"cache": "prompt_fragment", "result": "hit"}, prompt_assembler.hits),
+        ({"cache": "prompt_fragment", "result": "miss"}, prompt_assembler.misses),
+    ]
+    yield "cache_invalidated_total", "counter", "rules reload 로 지운 캐시 항목", [
+        ({"cache": "response"}, cache["invalidated"]),
+        ({"cache": "prompt_fragment"}, prompt_assembler.invalidated),
+    ]
+    rules = rules_repo.stats()
+    yield "rules_reloads_total", "counter", "rules 스냅샷 교체/거부 수", [
+        ({"kind": "full"}, rules["full_reloads"]),
+        ({"kind": "incremental"}, rules["incremental_reloads"]),
+        ({"kind": "rejected"}, rules["rejected_reloads"]),
+    ]
+
+    yield "output_parse_total", "counter", "LLM 출력 파싱 결과/보정 종류", [
+        ({"result": k}, v) for k, v in output_parser.stats().items()
+    ]
+    yield "traits_patch_items_total", "counter", "traits patch 항목 검증 결과", [
+        ({"result": k}, v) for k, v in patch_validator.stats().items() if k != "json_backend"
+    ]
+    if llm_hedger is not None:
+        hedging = llm_hedger.stats()
+        yield "llm_hedges_total", "counter", "hedge 요청 수/이긴 수", [
+            ({"result": "sent"}, hedging["hedged"]),
+            ({"result": "won"}, hedging["hedge_wins"]),
+            ({"result": "budget_denied"}, hedging["budget_denied"]),
+            ({"result": "slot_denied"}, hedging["slot_denied"]),
+        ]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,87 @@
+import threading
+
+
+class UsageStats:
+    """
+    LLM 응답의 usage 를 누적한다.
+    cached_input_tokens 는 provider 가 prompt prefix 캐시에서 재사용한 입력 토큰 수.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.requests_with_cache_hit = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        self.upstream_seconds = 0.0
+        self.upstream_seconds_with_cache_hit = 0.0
+
+    def record(self, usage, elapsed: float):
+        if usage is None:
+            return
+
+        details = getattr(usage, "input_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += usage.input_tokens or 0
+            self.cached_input_tokens += cached
+            self.output_tokens += usage.output_tokens or 0
+            self.upstream_seconds += elapsed
+            if cached:
+                self.requests_with_cache_hit += 1
+                self.upstream_seconds_with_cache_hit += elapsed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            misses = self.requests - self.requests_with_cache_hit
+            return {
+                "requests": self.requests,
+                "requests_with_cache_hit": self.requests_with_cache_hit,
+                "input_tokens": self.input_tokens,
+                "cached_input_tokens": self.cached_input_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_input_ratio": (self.cached_input_tokens / self.input_tokens) if self.input_tokens else 0.0,
+                "avg_upstream_seconds_cache_hit": (
+                    self.upstream_seconds_with_cache_hit / self.requests_with_cache_hit
+                    if self.requests_with_cache_hit else None
+                ),
+                "avg_upstream_seconds_cache_miss": (
+                    (self.upstream_seconds - self.upstream_seconds_with_cache_hit) / misses
+                    if misses else None
+                ),
+            }
+
+
+class ContextStats:
+    """컨텍스트 창 적용 전/후 입력 토큰 (instructions 제외, 메시지 히스토리만)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.windowed_requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.dropped_messages = 0
+
+    def record(self, tokens_before: int, tokens_after: int, dropped: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            if dropped:
+                self.windowed_requests += 1
+                self.dropped_messages += dropped
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "windowed_requests": self.windowed_requests,
+                "dropped_messages": self.dropped_messages,
+                "history_tokens_before": self.tokens_before,
+                "history_tokens_after": self.tokens_after,
+                "saved_ratio": (1 - self.tokens_after / self.tokens_before) if self.tokens_before else 0.0,
+            }
@@ -0,0 +1,165 @@
+import threading
+from collections import Counter
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+
+M = TypeVar("M", bound=BaseModel)
+
+# 잘린 JSON 을 콤마 위치에서 잘라 닫아보는 최대 횟수 (뒤에서부터)
+MAX_TRUNCATION_CUTS = 16
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# 잘린 출력을 닫거나 잘라서 살린 결과 (값 일부가 빠졌을 수 있음)
+TRUNCATION_REPAIRS = frozenset({"repaired_truncation", "repaired_truncation_cut"})
+
+
+# ==========================
+# 로컬 보정
+# ==========================
+
+def strip_wrapping(raw: str) -> str:
+    # 앞뒤 공백/BOM 과 ```json ... ``` 코드 펜스 제거
+    text = raw.strip().lstrip("\ufeff")
+    if text.startswith("```"):
+        text = text[3:]
+        newline = text.find("\n")
+        if newline != -1 and text[:newline].strip().isalpha():
+            text = text[newline + 1:]  # ```json 의 언어 표기
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+        text = text.strip()
+    return text
+
+
+def extract_object(text: str) -> str | None:
+    # JSON 앞뒤에 붙은 설명 문장 제거: 첫 '{' 부터 마지막 '}' 까지
+    start = text.find("{")
+    end = text.rfind("}")
+    if start <= 0 and end == len(text) - 1:
+        return None  # 이미 객체만 있음
+    if start == -1 or end < start:
+        return None
+    return text[start:end + 1]
+
+
+def truncation_candidates(text: str):
+    """
+    max_output_tokens 에 걸려 중간에 끊긴 JSON 을 닫아 본 후보들을 yield.
+    1) 끊긴 자리에서 열린 문자열/배열/객체를 그대로 닫은 것
+    2) 그래도 안 되면, 뒤에서부터 콤마 위치에서 잘라 (미완성 키/값 버림) 닫은 것
+    """
+    stack: list[str] = []
+    commas: list[tuple[int, str]] = []  # (콤마 위치, 그 시점에 닫아야 할 문자열)
+    in_string = False
+    escape_at = -1  # 문자열 안에서 마지막 '\' 위치 (이스케이프가 미완성일 때 잘라내기 위함)
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                escape_at = i
+                i += 6 if text.startswith("u", i + 1) else 2
+                continue
+            if ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                return  # 짝이 안 맞으면 잘린 게 아니라 깨진 JSON
+            stack.pop()
+        elif ch == ",":
+            commas.append((i, "".join(reversed(stack))))
+        i += 1
+
+    if not stack:
+        return  # 바깥 객체가 이미 닫혔으면 truncation 이 아님
+
+    head = text
+    if in_string:
+        if i > n:  # \n, \uXXXX 가 끝나기 전에 끊김
+            head = text[:escape_at]
+        head += '"'
+    yield head.rstrip().rstrip(",:") + "".join(reversed(stack))
+
+    for pos, closers in reversed(commas[-MAX_TRUNCATION_CUTS:]):
+        yield text[:pos] + closers
+
+
+# ==========================
+# 파서
+# ==========================
+
+class OutputParser(Generic[M]):
+    """
+    LLM 출력 문자열을 model.model_validate_json 으로 바로 검증한다 (json.loads → dict → 검증 두 번 안 함).
+    JSON 자체가 깨진 경우에만 공백/코드 펜스/앞뒤 잡문/잘림을 로컬에서 보정해 다시 시도하고,
+    어떤 보정이 몇 번 쓰였는지 센다. 보정으로도 안 되면 원래 ValidationError 를 그대로 올린다.
+    """
+
+    def __init__(self, model: type[M]):
+        self.model = model
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _try(self, text: str) -> tuple[M | None, bool]:
+        # (결과, JSON 자체는 유효했는지)
+        try:
+            return self.model.model_validate_json(text), True
+        except ValidationError as e:
+            return None, not any(err["type"] == "json_invalid" for err in e.errors())
+
+    def parse(self, raw: str) -> M:
+        return self.parse_with_kind(raw)[0]
+
+    def parse_with_kind(self, raw: str) -> tuple[M, str]:
+        # (결과, 어떤 경로로 살렸는지: clean / repaired_*)
+        try:
+            result = self.model.model_validate_json(raw)
+            self.record("clean")
+            return result, "clean"
+        except ValidationError as e:
+            if not any(err["type"] == "json_invalid" for err in e.errors()):
+                self.record("schema_invalid")  # 모양이 틀린 건 로컬에서 고칠 수 없음
+                raise
+            error = e
+
+        text = strip_wrapping(raw)
+        if text != raw:
+            result, _ = self._try(text)
+            if result is not None:
+                self.record("repaired_wrapping")
+                return result, "repaired_wrapping"
+
+        extracted = extract_object(text)
+        if extracted is not None:
+            result, _ = self._try(extracted)
+            if result is not None:
+                self.record("repaired_extract_object")
+                return result, "repaired_extract_object"
+
+        for attempt, candidate in enumerate(truncation_candidates(text)):
+            result, json_ok = self._try(candidate)
+            if result is not None:
+                kind = "repaired_truncation" if attempt == 0 else "repaired_truncation_cut"
+                self.record(kind)
+                return result, kind
+            if json_ok:
+                break  # JSON 은 맞는데 필드가 모자란 것: 더 앞에서 자르면 더 잃기만 함
+
+        self.record("failed")
+        raise error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,179 @@
+import json
+import threading
+
+from rules_repo import ChatContext, RulesSnapshot, diff_snapshots
+
+
+# ==========================
+# 고정 텍스트
+# ==========================
+
+PERSONA = """
+너는 1급 심리 상담사이자 연애/관계 분석 전문가야.
+상대방의 MBTI 성향과 현재 관계 상태의 특성을 기반으로, 내담자(사용자)의 불안함을 달래주고 날카로운 통찰을 제공해야 해.
+""".strip()
+
+WRITING_RULES_TEMPLATE = """
+======================
+assistant_message 작성 규칙 (핵심)
+======================
+사용자가 직접 읽는 답변이야. 절대 기계적으로 짧게 끝내지마.
+다음 흐름으로 3~4 문단의 풍부한 대답을 작성해:
+1. 공감 : 사용자의 현재 감정을 부드럽게 읽어주고 안심시킬 것.
+2. 성향 기반 분석 : {data_ref} 데이터의 'core_drives'나 'communication' 특징을 직접 언급하며 상대방의 행동이 왜 무관심이 아니라 그들만의 방식인지 설명할 것. (예 : "ISTP는 원래 에너지가 낮아서...")
+3) 근거 없는 MBTI 단정 금지. certainty가 low면 반드시 대안 후보 제시.
+4. 역질문: 대화를 이어가거나 추가 단서를 얻기 위해, 상황에 맞는 구체적인 질문 1개를 마지막에 던질 것.
+
+* 금지사항: JSON 분석 내용을 그대로 복붙하지 말 것. 딱딱한 말투 금지.
+""".strip()
+
+# ==========================
+# 레이아웃
+# ==========================
+# classic      : 페르소나 → 프로필 → 사용자 traits → 규칙 → 작성 규칙 (기존 순서)
+# cache_prefix : 페르소나 + 작성 규칙 → 관계 규칙 → 프로필 → 사용자 traits
+#                앞부분일수록 여러 요청이 공유하는 내용이라 provider 가 prefix 캐시를 재사용할 수 있다.
+LAYOUT_CLASSIC = "classic"
+LAYOUT_CACHE_PREFIX = "cache_prefix"
+LAYOUTS = (LAYOUT_CLASSIC, LAYOUT_CACHE_PREFIX)
+
+WRITING_RULES = WRITING_RULES_TEMPLATE.format(data_ref="위")
+STATIC_PREFIX = PERSONA + "\n\n" + WRITING_RULES_TEMPLATE.format(data_ref="아래")
+
+
+def dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False)
+
+
+# ==========================
+# 조각 렌더링
+# ==========================
+
+def render_profile_block(ctx: ChatContext) -> str:
+    return f"[상대방의 성향(MBTI 등) 데이터]\n{dumps(ctx.profile)}"
+
+
+def render_rules_block(ctx: ChatContext) -> str:
+    return (
+        f"[현재 관계 유형 규칙]\n{dumps(ctx.type_rules)}\n\n"
+        f"[현재 관계 상태 규칙]\n{dumps(ctx.state_rules)}"
+    )
+
+
+def render_user_traits_block(user_traits: dict) -> str:
+    return f"[대화에서 파악된 상대방 성향 (위 기본 데이터보다 우선)]\n{dumps(user_traits)}"
+
+
+def render_summary_block(summary: str) -> str:
+    return f"[이전 대화 요약 (아래 메시지보다 앞선 내용)]\n{summary}"
+
+
+# ==========================
+# 조립기
+# ==========================
+
+class PromptAssembler:
+    """
+    instructions 를 고정 텍스트 / [프로필 조각] / [규칙 조각] / [사용자 traits] 로 조립한다.
+    - 프로필 조각: mbti 별로 한 번만 렌더링
+    - 규칙 조각: (relationship_type, relationship_state) 별로 한 번만 렌더링
+    - 요청마다 직렬화하는 건 사용자 traits(delta) 뿐
+    같은 키면 항상 같은 바이트열을 돌려주므로 provider 쪽 prompt caching 에도 유리하다.
+    조각은 ChatContext 를 읽어온 스냅샷 기준으로 캐시하고, 스냅샷이 교체되면 두 스냅샷을 비교해서
+    내용이 바뀐 mbti / 관계 유형 / 관계 상태가 들어간 조각만 지운다.
+    교체 전에 읽은 (더 오래된 스냅샷의) ChatContext 는 캐시를 건드리지 않고 렌더링만 한다.
+    live 읽기(ctx.source 가 None)면 캐시 없이 매번 렌더링한다.
+    """
+
+    def __init__(self, layout: str = LAYOUT_CACHE_PREFIX):
+        if layout not in LAYOUTS:
+            raise ValueError(f"unknown prompt layout: {layout}")
+        self.layout = layout
+        self._snapshot: RulesSnapshot | None = None
+        self._profile_blocks: dict[str | None, str] = {}
+        self._rules_blocks: dict[tuple[str | None, str | None], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0  # 스냅샷 교체로 지운 조각 수
+
+    def _sync(self, snap: RulesSnapshot) -> bool:
+        """snap 기준으로 캐시를 써도 되면 True"""
+        if snap is self._snapshot:
+            return True
+        with self._lock:
+            current = self._snapshot
+            if snap is current:
+                return True
+            if current is not None and snap.loaded_at < current.loaded_at:
+                return False
+            if current is not None:
+                changed = diff_snapshots(current, snap)
+                profiles = set(changed.get("mbti_profiles", ()))
+                types = set(changed.get("relationship_type_modifiers", ()))
+                states = set(changed.get("relationship_state_modifiers", ()))
+                profile_blocks = {k: v for k, v in self._profile_blocks.items() if k not in profiles}
+                rules_blocks = {k: v for k, v in self._rules_blocks.items() if k[0] not in types and k[1] not in states}
+                self.invalidated += len(self._profile_blocks) - len(profile_blocks) + len(self._rules_blocks) - len(rules_blocks)
+                self._profile_blocks = profile_blocks
+                self._rules_blocks = rules_blocks
+            self._snapshot = snap
+            return True
+
+    def _store(self, cache: str, snap: RulesSnapshot, key, block: str):
+        # 렌더링하는 사이 스냅샷이 교체됐으면 이전 내용으로 만든 조각이므로 넣지 않음
+        with self._lock:
+            if snap is self._snapshot:
+                getattr(self, cache)[key] = block
+
+    def profile_block(self, ctx: ChatContext) -> str:
+        if ctx.source is None or not self._sync(ctx.source):
+            self.misses += 1
+            return render_profile_block(ctx)
+
+        block = self._profile_blocks.get(ctx.mbti)
+        if block is not None:
+            self.hits += 1
+            return block
+
+        self.misses += 1
+        block = render_profile_block(ctx)
+        # 알 수 없는 코드는 캐시하지 않음 (사용자 입력으로 캐시가 무한히 커지지 않도록)
+        if ctx.profile_known:
+            self._store("_profile_blocks", ctx.source, ctx.mbti, block)
+        return block
+
+    def rules_block(self, ctx: ChatContext) -> str:
+        if ctx.source is None or not self._sync(ctx.source):
+            self.misses += 1
+            return render_rules_block(ctx)
+
+        key = (ctx.type_code, ctx.state_code)
+        block = self._rules_blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            return block
+
+        self.misses += 1
+        block = render_rules_block(ctx)
+        if ctx.rules_known:
+            self._store("_rules_blocks", ctx.source, key, block)
+        return block
+
+    def build(self, ctx: ChatContext, user_traits: dict, summary: str | None = None) -> str:
+        if self.layout == LAYOUT_CACHE_PREFIX:
+            parts = [STATIC_PREFIX, self.rules_block(ctx), self.profile_block(ctx)]
+            if user_traits:
+                parts.append(render_user_traits_block(user_traits))
+            if summary:
+                parts.append(render_summary_block(summary))
+            return "\n\n".join(parts)
+
+        parts = [PERSONA, self.profile_block(ctx)]
+        if user_traits:
+            parts.append(render_user_traits_block(user_traits))
+        if summary:
+            parts.append(render_summary_block(summary))
+        parts.append(self.rules_block(ctx))
+        parts.append(WRITING_RULES)
+        return "\n\n".join(parts)
@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlite_pool import ProcessConnection
+
+
+def canonical_key(payload: Any) -> str:
+    # 키 순서/공백과 무관하게 같은 입력이면 같은 해시
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ==========================
+# 저장소
+# ==========================
+
+class MemoryLRU:
+    """
+    OrderedDict 기반 LRU + TTL (값은 JSON 으로 직렬화 가능한 dict).
+    항목마다 태그를 달 수 있고, invalidate(태그) 로 그 태그가 붙은 항목만 지운다.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, dict, tuple[str, ...]]] = OrderedDict()
+        self._tagged: dict[str, set[str]] = {}  # 태그 → 키
+        self._lock = threading.Lock()
+
+    def _unlink(self, key: str, tags: tuple[str, ...]):
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value, tags = entry
+            if expires_at < time.time():
+                del self._data[key]
+                self._unlink(key, tags)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, tags: tuple[str, ...] = ()):
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None:
+                self._unlink(key, previous[2])
+            self._data[key] = (time.time() + self.ttl, value, tags)
+            self._data.move_to_end(key)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                evicted, (_, _, evicted_tags) = self._data.popitem(last=False)
+                self._unlink(evicted, evicted_tags)
+
+    def invalidate(self, tags: tuple[str, ...]) -> int:
+        with self._lock:
+            keys = set().union(*(self._tagged.get(tag, ()) for tag in tags))
+            for key in keys:
+                _, _, key_tags = self._data.pop(key)
+                self._unlink(key, key_tags)
+            return len(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCache:
+    """
+    재시작 후에도 남는 디스크 캐시. 메모리 LRU 뒤의 2차 저장소로 쓴다.
+    last_access 기준으로 max_entries 를 넘는 오래된 항목부터 지운다.
+    태그는 공백으로 감싼 문자열 컬럼에 두고, invalidate 는 드물게만 불리므로 인덱스 없이 훑는다.
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl: float):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = ProcessConnection(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value_json TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                tags TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(response_cache)")}
+        if "tags" not in columns:
+            # 태그 컬럼이 없던 예전 파일: 기존 항목은 코드별로 지울 수 없으므로 비우고 시작
+            conn.execute("ALTER TABLE response_cache ADD COLUMN tags TEXT NOT NULL DEFAULT ''")
+            conn.execute("DELETE FROM response_cache")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+        return conn
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            conn = self._conn.get()
+            row = conn.execute(
+                "SELECT value_json, expires_at FROM response_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM response_cache WHERE key=?", (key,))
+                return None
+            conn.execute("UPDATE response_cache SET last_access=? WHERE key=?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict, tags: tuple[str, ...] = ()):
+        now = time.time()
+        with self._lock:
+            conn = self._conn.get()
+            conn.execute("""
+                INSERT INTO response_cache(key, value_json, expires_at, last_access, tags)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value_json=excluded.value_json,
+                    expires_at=excluded.expires_at,
+                    last_access=excluded.last_access,
+                    tags=excluded.tags
+            """, (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now, _tag_column(tags)))
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def invalidate(self, tags: tuple[str, ...]) -> int:
+        if not tags:
+            return 0
+        with self._lock:
+            conn = self._conn.get()
+            # LIKE 는 '_' 를 와일드카드로 보므로 instr 로 비교 (코드에 '_' 가 들어 있음)
+            where = " OR ".join("instr(tags, ?) > 0" for _ in tags)
+            return conn.execute(
+                f"DELETE FROM response_cache WHERE {where}", [f" {tag} " for tag in tags]
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _tag_column(tags: tuple[str, ...]) -> str:
+    return f" {' '.join(tags)} " if tags else ""
+
+
+# ==========================
+# 캐시 + single-flight
+# ==========================
+
+class Uncacheable:
+    """compute 가 결과를 이걸로 감싸 돌려주면 기다리던 요청들에는 값을 주되 캐시에는 저장하지 않는다"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: dict):
+        self.value = value
+
+
+class ResponseCache:
+    """
+    같은 키의 요청이 동시에 여러 개 들어오면 upstream 호출은 하나만 하고 결과를 나눠 쓴다.
+    compute 가 예외를 던지면 캐시하지 않고 기다리던 요청 모두에게 같은 예외를 전달한다.
+    compute 가 Uncacheable 로 감싼 값(예: 잘린 출력을 보정한 응답)도 나눠 쓰기만 하고 저장하지 않는다.
+    항목에 태그(예: rules 코드)를 달아두면 invalidate 로 그 태그가 붙은 항목만 지울 수 있다.
+    invalidate 가 일어나기 전에 시작된 계산 결과는 (이전 데이터로 만든 것일 수 있으므로) 저장하지 않는다.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, disk_path: Optional[Path] = None):
+        self.enabled = max_entries > 0
+        self.memory = MemoryLRU(max_entries, ttl)
+        self.disk = SqliteCache(disk_path, max_entries * 8, ttl) if (disk_path and self.enabled) else None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # miss 였지만 진행 중인 호출에 합류한 요청 수
+        self.generation = 0  # invalidate 할 때마다 증가
+        self.invalidated = 0
+        self.uncacheable = 0  # compute 가 Uncacheable 로 돌려줘서 저장하지 않은 결과 수
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict, tags: tuple[str, ...] = (), generation: Optional[int] = None):
+        # generation: 값을 계산하기 시작할 때의 self.generation (그 사이 invalidate 됐으면 저장하지 않음)
+        if not self.enabled or (generation is not None and generation != self.generation):
+            return
+        self.memory.set(key, value, tags)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, tags)
+
+    async def invalidate(self, tags: tuple[str, ...]) -> int:
+        """태그 중 하나라도 붙은 항목을 메모리/디스크에서 지우고 지운 수를 돌려준다"""
+        if not self.enabled or not tags:
+            return 0
+        self.generation += 1
+        removed = self.memory.invalidate(tags)
+        if self.disk is not None:
+            removed = max(removed, await asyncio.to_thread(self.disk.invalidate, tags))
+        self.invalidated += removed
+        return removed
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[dict | Uncacheable]], tags: tuple[str, ...] = ()
+    ) -> dict:
+        if not self.enabled:
+            value = await compute()
+            return value.value if isinstance(value, Uncacheable) else value
+
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # 먼저 온 요청이 끊겨도 upstream 호출은 계속되도록 shield
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._compute_and_store(key, compute, tags))
+        # 기다리던 요청이 전부 끊겨도 "exception was never retrieved" 경고가 나지 않도록
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(
+        self, key: str, compute: Callable[[], Awaitable[dict | Uncacheable]], tags: tuple[str, ...]
+    ) -> dict:
+        generation = self.generation
+        try:
+            value = await compute()
+            if isinstance(value, Uncacheable):
+                self.uncacheable += 1
+                return value.value
+            await self.set(key, value, tags, generation)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidated": self.invalidated,
+            "uncacheable": self.uncacheable,
+            "disk": self.disk is not None,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
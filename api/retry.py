@@ -0,0 +1,236 @@
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from pydantic import ValidationError
+
+from limiter import Overloaded
+
+
+T = TypeVar("T")
+
+# 잠깐 기다리면 성공할 가능성이 있는 upstream 상태 코드
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Overloaded):
+    """upstream 오류율이 높아 회로가 열린 상태: 호출하지 않고 바로 503"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(503, "AI 서버 응답이 불안정해서 잠시 요청을 멈췄어.", retry_after=retry_after)
+
+
+class DeadlineExceeded(Exception):
+    """요청 단위 마감 시간 안에 성공하지 못함"""
+
+
+def classify(exc: BaseException) -> str | None:
+    """재시도할 사유를 돌려준다. 재시도해도 소용없는 오류(4xx 등)면 None"""
+    if isinstance(exc, Overloaded):
+        return None  # 우리 쪽에서 거절한 것 (limiter/circuit)
+    if isinstance(exc, ValidationError):
+        return "invalid_output"  # 로컬 보정으로도 못 고친 출력 → 다시 생성
+    # openai SDK 는 client 를 처음 만들 때 import 된다 (아직 import 전이면 openai 예외일 수도 없음)
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        if isinstance(exc, openai.APITimeoutError):
+            return "timeout"
+        if isinstance(exc, openai.APIConnectionError):
+            return "connection"
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500):
+        return f"http_{status}"
+    return None
+
+
+def retry_after_seconds(exc: BaseException) -> float:
+    # 429/503 의 Retry-After 헤더가 있으면 그만큼은 기다림
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0.0
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except ValueError:
+        return 0.0
+
+
+# ==========================
+# 서킷 브레이커
+# ==========================
+
+class CircuitBreaker:
+    """
+    최근 window 개 upstream 결과 중 실패 비율이 failure_ratio 이상이면 open.
+    open 동안은 호출 없이 CircuitOpen, cooldown 이 지나면 half_open 으로 한 건만 시험 호출해서
+    성공하면 closed, 실패하면 다시 open. (출력 검증 실패/4xx 는 upstream 상태와 무관하므로 세지 않음)
+    """
+
+    def __init__(self, window: int = 50, min_requests: int = 10, failure_ratio: float = 0.5, cooldown: float = 10.0):
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self._results: deque[bool] = deque(maxlen=window)  # True = 실패
+        self._opened_at: float | None = None
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def _reject(self):
+        self.rejected += 1
+        remaining = self.cooldown - (time.monotonic() - self._opened_at)
+        raise CircuitOpen(retry_after=max(1, int(remaining + 0.999)))
+
+    def reject_if_open(self):
+        # 스트리밍 엔드포인트가 응답 시작 전에 HTTP 503 으로 거절할 때 (시험 호출 자리는 잡지 않음)
+        if self.state == "open":
+            self._reject()
+
+    def before_call(self):
+        state = self.state
+        if state == "open":
+            self._reject()
+        if state == "half_open":
+            if self._probing:
+                self._reject()
+            self._probing = True
+
+    def record(self, failed: bool | None):
+        # failed=None: upstream 상태와 무관한 결과 (시험 호출 자리만 반납)
+        probing, self._probing = self._probing, False
+        if failed is None:
+            return
+        if probing:
+            if failed:
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            else:
+                self._opened_at = None
+                self._results.clear()
+            return
+
+        self._results.append(failed)
+        if (
+            self._opened_at is None
+            and len(self._results) >= self.min_requests
+            and sum(self._results) / len(self._results) >= self.failure_ratio
+        ):
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def stats(self) -> dict:
+        failures = sum(self._results)
+        return {
+            "state": self.state,
+            "recent_failure_ratio": failures / len(self._results) if self._results else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+# ==========================
+# 재시도 스케줄러
+# ==========================
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    deadline: float = 45.0  # 첫 시도부터 마지막 응답까지 전체 시간
+
+    def backoff(self, attempt: int) -> float:
+        # exponential backoff + full jitter (동시에 실패한 요청들이 같은 순간에 몰리지 않게)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryScheduler:
+    """
+    op 을 RetryPolicy 에 따라 재시도한다.
+    - 재시도 가능한 오류(classify)만 재시도, 나머지는 바로 올림
+    - 남은 시간이 다음 대기보다 짧으면 포기하고 DeadlineExceeded
+    - 매 시도 전에 CircuitBreaker 확인
+    재시도 횟수/사유와 재시도로 늘어난 시간(실패한 시도 + 대기)을 stats() 로 본다.
+    """
+
+    def __init__(self, policy: RetryPolicy, breaker: CircuitBreaker):
+        self.policy = policy
+        self.breaker = breaker
+        self.requests = 0
+        self.attempts = 0
+        self.recovered = 0
+        self.gave_up = 0
+        self.deadline_exceeded = 0
+        self.added_seconds = 0.0
+        self.retries: Counter = Counter()
+
+    async def run(self, op: Callable[[], Awaitable[T]]) -> T:
+        self.requests += 1
+        deadline = time.monotonic() + self.policy.deadline
+        added = 0.0
+        try:
+            for attempt in range(self.policy.max_attempts):
+                self.breaker.before_call()
+                started = time.monotonic()
+                remaining = deadline - started
+                self.attempts += 1
+                try:
+                    result = await asyncio.wait_for(op(), timeout=remaining)
+                except asyncio.CancelledError:
+                    self.breaker.record(None)  # 클라이언트가 끊은 것: 시험 호출 자리만 반납
+                    raise
+                except Exception as e:
+                    # 3.11 부터 asyncio.TimeoutError 는 내장 TimeoutError 라서 op 안에서 난 다른 timeout
+                    # (sqlite 풀 고갈 등)과 구분되지 않는다 → 마감 시간이 실제로 지났는지로 판단
+                    if isinstance(e, TimeoutError) and time.monotonic() >= deadline:
+                        self.breaker.record(True)
+                        self.deadline_exceeded += 1
+                        raise DeadlineExceeded() from e
+                    reason = classify(e)
+                    self.breaker.record(None if reason in (None, "invalid_output") else True)
+                    if reason is None or attempt + 1 >= self.policy.max_attempts:
+                        self.gave_up += reason is not None
+                        raise
+
+                    delay = max(self.policy.backoff(attempt), min(retry_after_seconds(e), self.policy.max_delay))
+                    if time.monotonic() + delay >= deadline:
+                        self.deadline_exceeded += 1
+                        raise DeadlineExceeded() from e
+
+                    self.retries[reason] += 1
+                    added += (time.monotonic() - started) + delay
+                    await asyncio.sleep(delay)
+                else:
+                    self.breaker.record(False)
+                    self.recovered += attempt > 0
+                    return result
+        finally:
+            self.added_seconds += added
+
+    def stats(self) -> dict:
+        total_retries = sum(self.retries.values())
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": total_retries,
+            "retries_by_reason": dict(self.retries),
+            "recovered": self.recovered,
+            "gave_up": self.gave_up,
+            "deadline_exceeded": self.deadline_exceeded,
+            "added_seconds_total": self.added_seconds,
+            "added_seconds_per_retry": self.added_seconds / total_retries if total_retries else 0.0,
+            "circuit": self.breaker.stats(),
+        }
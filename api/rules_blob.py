@@ -0,0 +1,284 @@
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+
+# ==========================
+# 컴파일된 rules 스냅샷 (rules.snap)
+# ==========================
+# init_db.py 가 rules.db 를 쓴 뒤 같이 만드는 읽기 전용 바이너리 파일. 원본은 항상 rules.db 이고,
+# 헤더의 source checksum 이 DB 내용과 다르면 (stale) API 는 이 파일을 무시하고 DB 에서 읽는다.
+#
+# 레이아웃 (little-endian)
+#   header  : magic, format 버전, 항목 수, source sha256, 문자열/값 영역 offset, 본문 crc32
+#   index   : 항목마다 (종류, 코드 문자열, display_name 문자열, version, 값 offset) 고정 크기
+#   strings : (offset, 길이) 표 + UTF-8 바이트. 같은 문자열은 한 번만 저장 (dict 키, 반복되는 값)
+#   values  : 태그 1바이트 + 내용 (dict/list 는 개수 다음에 원소가 이어짐)
+# 읽을 때는 mmap 위의 memoryview 에서 바로 디코딩하므로 JSON 텍스트를 거치지 않는다.
+
+MAGIC = b"MBTISNAP"
+FORMAT_VERSION = 1
+
+KIND_PROFILE = 0
+KIND_TYPE_RULES = 1
+KIND_STATE_RULES = 2
+
+NO_STRING = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<8sHHI32sIIII")  # magic, version, reserved, entries, source_sha256, strings, string_count, values, crc32
+_ENTRY = struct.Struct("<BxxxIIII")       # kind, code, display_name, version, value offset
+_STRING = struct.Struct("<II")            # offset, length
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+_TAG_NULL, _TAG_FALSE, _TAG_TRUE, _TAG_INT, _TAG_FLOAT, _TAG_STR, _TAG_LIST, _TAG_DICT = range(8)
+
+
+class BlobError(ValueError):
+    """손상되었거나 형식 버전이 다른 스냅샷 파일"""
+
+
+# 원본 테이블 전체(비활성 행 포함)를 JSON 파싱 없이 훑어 checksum 을 만든다
+# (TEXT 는 BLOB 으로 캐스팅해서 str 로 디코딩/재인코딩하지 않음)
+SOURCE_SQL = """
+    SELECT 'mbti_profiles', CAST(mbti AS BLOB), NULL, CAST(profile_json AS BLOB), version, is_active
+    FROM mbti_profiles
+    UNION ALL
+    SELECT 'relationship_type_modifiers', CAST(type_code AS BLOB), CAST(display_name AS BLOB), CAST(rules_json AS BLOB), version, is_active
+    FROM relationship_type_modifiers
+    UNION ALL
+    SELECT 'relationship_state_modifiers', CAST(state_code AS BLOB), CAST(display_name AS BLOB), CAST(rules_json AS BLOB), version, is_active
+    FROM relationship_state_modifiers
+    ORDER BY 1, 2
+"""
+
+
+def source_checksum(conn: sqlite3.Connection) -> bytes:
+    digest = hashlib.sha256()
+    for row in conn.execute(SOURCE_SQL):
+        digest.update(b"\x1f".join(v if isinstance(v, bytes) else str(v).encode("utf-8") for v in row))
+        digest.update(b"\x1e")
+    return digest.digest()
+
+
+# ==========================
+# 쓰기
+# ==========================
+
+class _Encoder:
+    def __init__(self):
+        self.strings: dict[str, int] = {}
+        self.values = bytearray()
+
+    def string(self, text: str) -> int:
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def value(self, value: Any) -> int:
+        offset = len(self.values)
+        self._write(value)
+        return offset
+
+    def _write(self, value: Any):
+        out = self.values
+        if value is None:
+            out.append(_TAG_NULL)
+        elif value is True:
+            out.append(_TAG_TRUE)
+        elif value is False:
+            out.append(_TAG_FALSE)
+        elif isinstance(value, int):
+            out.append(_TAG_INT)
+            out += _I64.pack(value)
+        elif isinstance(value, float):
+            out.append(_TAG_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, str):
+            out.append(_TAG_STR)
+            out += _U32.pack(self.string(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(_TAG_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self._write(item)
+        elif isinstance(value, dict):
+            out.append(_TAG_DICT)
+            out += _U32.pack(len(value))
+            for key, item in value.items():
+                out += _U32.pack(self.string(str(key)))
+                self._write(item)
+        else:
+            raise TypeError(f"unsupported value in rules snapshot: {type(value).__name__}")
+
+
+def build_blob(conn: sqlite3.Connection) -> bytes:
+    """rules.db 의 활성 행으로 스냅샷 바이트열을 만든다"""
+    enc = _Encoder()
+    entries = []
+
+    for mbti, profile_json, version in conn.execute(
+        "SELECT mbti, profile_json, version FROM mbti_profiles WHERE is_active=1 ORDER BY mbti"
+    ):
+        entries.append((KIND_PROFILE, enc.string(mbti.upper()), NO_STRING, version, enc.value(json.loads(profile_json))))
+
+    for kind, table, code_col in (
+        (KIND_TYPE_RULES, "relationship_type_modifiers", "type_code"),
+        (KIND_STATE_RULES, "relationship_state_modifiers", "state_code"),
+    ):
+        for code, display_name, rules_json, version in conn.execute(
+            f"SELECT {code_col}, display_name, rules_json, version FROM {table} WHERE is_active=1 ORDER BY {code_col}"
+        ):
+            rules = json.loads(rules_json).get("rules", [])
+            entries.append((kind, enc.string(code), enc.string(display_name), version, enc.value(rules)))
+
+    checksum = source_checksum(conn)
+
+    encoded = [text.encode("utf-8") for text in enc.strings]  # dict 는 삽입 순서 = index 순서
+    string_table = bytearray()
+    position = 0
+    for raw in encoded:
+        string_table += _STRING.pack(position, len(raw))
+        position += len(raw)
+    string_data = b"".join(encoded)
+
+    body = bytearray()
+    for entry in entries:
+        body += _ENTRY.pack(*entry)
+    strings_offset = _HEADER.size + len(body)
+    body += string_table
+    body += string_data
+    values_offset = _HEADER.size + len(body)
+    body += enc.values
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, len(entries), checksum,
+        strings_offset, len(encoded), values_offset, zlib.crc32(body),
+    )
+    return header + bytes(body)
+
+
+def write_blob(db_path: Path, out_path: Path) -> int:
+    """스냅샷을 임시 파일에 쓰고 rename (읽는 쪽이 mmap 해둔 이전 파일은 그대로 유지됨). 쓴 바이트 수를 돌려준다"""
+    conn = sqlite3.connect(db_path)
+    try:
+        data = build_blob(conn)
+    finally:
+        conn.close()
+    out_path = Path(out_path)
+    tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, out_path)
+    return len(data)
+
+
+# ==========================
+# 읽기
+# ==========================
+
+class RulesBlob:
+    """
+    mmap 으로 연 스냅샷. 열 때 헤더/crc 확인 후 index 만 읽고, 값은 요청한 항목만 디코딩한다.
+    문자열은 index 별로 한 번만 디코딩(sys.intern)해서 여러 프로필이 같은 str 객체를 공유한다.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        buf = self._buf
+        if len(buf) < _HEADER.size:
+            raise BlobError("truncated header")
+        (magic, version, _, count, checksum,
+         strings_offset, string_count, values_offset, crc) = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise BlobError("not a rules snapshot")
+        if version != FORMAT_VERSION:
+            raise BlobError(f"unsupported snapshot format {version}")
+        if zlib.crc32(buf[_HEADER.size:]) != crc:
+            raise BlobError("checksum mismatch (corrupted snapshot)")
+
+        self.source_checksum = checksum
+        self._string_table = strings_offset
+        self._string_data = strings_offset + string_count * _STRING.size
+        self._values = values_offset
+        self._strings: list[Optional[str]] = [None] * string_count
+
+        self.index: dict[tuple[int, str], tuple[Optional[str], int, int]] = {}
+        for i in range(count):
+            kind, code, display_name, entry_version, offset = _ENTRY.unpack_from(buf, _HEADER.size + i * _ENTRY.size)
+            name = None if display_name == NO_STRING else self.string(display_name)
+            self.index[(kind, self.string(code))] = (name, entry_version, offset)
+
+    def string(self, index: int) -> str:
+        text = self._strings[index]
+        if text is None:
+            offset, length = _STRING.unpack_from(self._buf, self._string_table + index * _STRING.size)
+            start = self._string_data + offset
+            text = self._strings[index] = sys.intern(str(self._buf[start:start + length], "utf-8"))
+        return text
+
+    def value(self, offset: int) -> Any:
+        value, _ = self._read(self._values + offset)
+        return value
+
+    def _read(self, pos: int) -> tuple[Any, int]:
+        buf = self._buf
+        tag = buf[pos]
+        pos += 1
+        if tag == _TAG_STR:
+            return self.string(_U32.unpack_from(buf, pos)[0]), pos + 4
+        if tag == _TAG_DICT:
+            (count,) = _U32.unpack_from(buf, pos)
+            pos += 4
+            result = {}
+            for _ in range(count):
+                key = self.string(_U32.unpack_from(buf, pos)[0])
+                result[key], pos = self._read(pos + 4)
+            return result, pos
+        if tag == _TAG_LIST:
+            (count,) = _U32.unpack_from(buf, pos)
+            pos += 4
+            items = []
+            for _ in range(count):
+                item, pos = self._read(pos)
+                items.append(item)
+            return items, pos
+        if tag == _TAG_INT:
+            return _I64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _TAG_FLOAT:
+            return _F64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _TAG_TRUE:
+            return True, pos
+        if tag == _TAG_FALSE:
+            return False, pos
+        if tag == _TAG_NULL:
+            return None, pos
+        raise BlobError(f"unknown value tag {tag}")
+
+    def entries(self, kind: int) -> Iterator[tuple[str, Optional[str], int, int]]:
+        # (코드, display_name, version, 값 offset)
+        for (entry_kind, code), (display_name, version, offset) in self.index.items():
+            if entry_kind == kind:
+                yield code, display_name, version, offset
+
+    def close(self):
+        self._buf.release()
+        self._mm.close()
@@ -0,0 +1,540 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Mapping, Optional
+
+from rules_blob import KIND_PROFILE, KIND_STATE_RULES, KIND_TYPE_RULES, BlobError, RulesBlob, source_checksum
+from sqlite_pool import SQLitePool
+
+
+# ==========================
+# 스냅샷 구조
+# ==========================
+# rules.db 는 프로필 16개 + modifier 몇 줄뿐이라 통째로 메모리에 올려두고,
+# 요청 처리 중에는 디스크/JSON 파싱 없이 스냅샷만 본다.
+# 스냅샷 안의 dict/list 는 여러 요청이 공유하므로 "읽기 전용"으로 다뤄야 한다.
+
+@dataclass(frozen=True)
+class MbtiProfile:
+    mbti: str
+    profile: Mapping[str, Any]
+    version: int
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    code: str
+    display_name: str
+    rules: tuple
+    version: int
+
+
+@dataclass(frozen=True)
+class RulesSnapshot:
+    profiles: Mapping[str, MbtiProfile]
+    type_rules: Mapping[str, RuleSet]
+    state_rules: Mapping[str, RuleSet]
+    fingerprint: tuple  # (table, code, version, is_active) 목록 - 변경 감지용
+    mtime_ns: int
+    loaded_at: float
+
+    # 아래 payload 는 예전 fetch_* 함수가 DB 에서 만들던 것과 같은 모양
+    def profile(self, mbti: str | None) -> Mapping[str, Any]:
+        if not mbti:
+            return {}
+        found = self.profiles.get(mbti.upper().strip())
+        return found.profile if found else {}
+
+    def type_rules_payload(self, type_code: str | None) -> dict:
+        return _rules_payload("type_code", type_code, self.type_rules.get(type_code) if type_code else None)
+
+    def state_rules_payload(self, state_code: str | None) -> dict:
+        return _rules_payload("state_code", state_code, self.state_rules.get(state_code) if state_code else None)
+
+    def warm(self):
+        # rules.snap 에서 읽은 스냅샷은 항목을 처음 조회할 때 디코딩하므로 미리 전부 풀어둘 때 사용
+        for mapping in (self.profiles, self.type_rules, self.state_rules):
+            for _ in mapping.values():
+                pass
+
+    def chat_context(self, mbti: str | None, type_code: str | None, state_code: str | None) -> "ChatContext":
+        mbti = mbti.upper().strip() if mbti else None
+        return ChatContext(
+            mbti=mbti,
+            type_code=type_code,
+            state_code=state_code,
+            profile=self.profile(mbti),
+            type_rules=self.type_rules_payload(type_code),
+            state_rules=self.state_rules_payload(state_code),
+            source=self,
+        )
+
+
+@dataclass(frozen=True)
+class ChatContext:
+    """
+    한 턴에 필요한 규칙 데이터 묶음: (mbti, 관계 유형, 관계 상태) 로 한 번에 읽는다.
+    source 는 읽어온 스냅샷 (live 읽기면 None) - 캐시 무효화 기준으로 쓴다.
+    """
+    mbti: str | None
+    type_code: str | None
+    state_code: str | None
+    profile: Mapping[str, Any]
+    type_rules: dict
+    state_rules: dict
+    source: Optional[RulesSnapshot] = None
+
+    @property
+    def profile_known(self) -> bool:
+        return self.mbti is None or bool(self.profile)
+
+    @property
+    def rules_known(self) -> bool:
+        return (self.type_code is None or self.type_rules["display_name"] is not None) and (
+            self.state_code is None or self.state_rules["display_name"] is not None
+        )
+
+
+def _rules_payload(code_key: str, code: str | None, rule_set: Optional[RuleSet]) -> dict:
+    if not rule_set:
+        return {code_key: code, "display_name": None, "rules": []}
+    return {code_key: code, "display_name": rule_set.display_name, "rules": list(rule_set.rules)}
+
+
+# 변경 감지는 version/is_active 컬럼만 훑는다 (JSON 컬럼은 읽지 않음)
+FINGERPRINT_SQL = """
+    SELECT 'mbti_profiles', mbti, version, is_active FROM mbti_profiles
+    UNION ALL
+    SELECT 'relationship_type_modifiers', type_code, version, is_active FROM relationship_type_modifiers
+    UNION ALL
+    SELECT 'relationship_state_modifiers', state_code, version, is_active FROM relationship_state_modifiers
+    ORDER BY 1, 2
+"""
+
+
+def _connect_ro(db_path: Path) -> sqlite3.Connection:
+    # mode=ro: 파일이 없을 때 빈 DB를 새로 만들어버리지 않도록
+    return sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+@contextmanager
+def _reader(db_path: Path, pool: Optional[SQLitePool]) -> Iterator[sqlite3.Connection]:
+    # 풀이 있으면 빌려 쓰고, 없으면 한 번 쓰고 닫는 커넥션
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
+    conn = _connect_ro(db_path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _code_filter(code_col: str, codes: Optional[list[str]]) -> str:
+    return f" AND {code_col} IN ({', '.join('?' for _ in codes)})" if codes is not None else ""
+
+
+def _read_profiles(cur: sqlite3.Cursor, codes: Optional[list[str]] = None) -> dict[str, MbtiProfile]:
+    cur.execute(f"""
+        SELECT mbti, profile_json, version
+        FROM mbti_profiles
+        WHERE is_active=1{_code_filter("mbti", codes)}
+    """, codes or ())
+    return {
+        mbti.upper(): MbtiProfile(mbti=mbti.upper(), profile=json.loads(profile_json), version=version)
+        for mbti, profile_json, version in cur.fetchall()
+    }
+
+
+def _read_rule_sets(cur: sqlite3.Cursor, table: str, code_col: str, codes: Optional[list[str]] = None) -> dict[str, RuleSet]:
+    cur.execute(f"""
+        SELECT {code_col}, display_name, rules_json, version
+        FROM {table}
+        WHERE is_active=1{_code_filter(code_col, codes)}
+    """, codes or ())
+    result = {}
+    for code, display_name, rules_json, version in cur.fetchall():
+        payload = json.loads(rules_json)
+        result[code] = RuleSet(
+            code=code,
+            display_name=display_name,
+            rules=tuple(payload.get("rules", [])),
+            version=version,
+        )
+    return result
+
+
+def load_snapshot(db_path: Path, pool: Optional[SQLitePool] = None) -> RulesSnapshot:
+    mtime_ns = os.stat(db_path).st_mtime_ns
+
+    with _reader(db_path, pool) as conn:
+        cur = conn.cursor()
+        profiles = _read_profiles(cur)
+        type_rules = _read_rule_sets(cur, "relationship_type_modifiers", "type_code")
+        state_rules = _read_rule_sets(cur, "relationship_state_modifiers", "state_code")
+        fingerprint = tuple(cur.execute(FINGERPRINT_SQL).fetchall())
+
+    return RulesSnapshot(
+        profiles=MappingProxyType(profiles),
+        type_rules=MappingProxyType(type_rules),
+        state_rules=MappingProxyType(state_rules),
+        fingerprint=fingerprint,
+        mtime_ns=mtime_ns,
+        loaded_at=time.time(),
+    )
+
+
+RULE_TABLES = {
+    "mbti_profiles": "profiles",
+    "relationship_type_modifiers": "type_rules",
+    "relationship_state_modifiers": "state_rules",
+}
+
+
+def changed_codes(old: tuple, new: tuple) -> dict[str, list[str]]:
+    """fingerprint 두 개를 비교해서 테이블별로 추가/삭제되었거나 version/is_active 가 바뀐 코드"""
+    before = {(table, code): rest for table, code, *rest in old}
+    after = {(table, code): rest for table, code, *rest in new}
+    changed: dict[str, list[str]] = {}
+    for key in sorted(before.keys() | after.keys()):
+        if before.get(key) != after.get(key):
+            changed.setdefault(key[0], []).append(key[1])
+    return changed
+
+
+def update_snapshot(
+    current: RulesSnapshot,
+    changed: dict[str, list[str]],
+    fingerprint: tuple,
+    mtime_ns: int,
+    db_path: Path,
+    pool: Optional[SQLitePool] = None,
+) -> RulesSnapshot:
+    """바뀐 코드의 행만 다시 읽고, 나머지 항목은 current 의 객체를 그대로 쓴 새 스냅샷"""
+    profiles = dict(current.profiles)
+    type_rules = dict(current.type_rules)
+    state_rules = dict(current.state_rules)
+
+    with _reader(db_path, pool) as conn:
+        cur = conn.cursor()
+        codes = changed.get("mbti_profiles")
+        if codes:
+            for code in codes:
+                profiles.pop(code.upper(), None)
+            profiles.update(_read_profiles(cur, codes))
+        for table, code_col, target in (
+            ("relationship_type_modifiers", "type_code", type_rules),
+            ("relationship_state_modifiers", "state_code", state_rules),
+        ):
+            codes = changed.get(table)
+            if codes:
+                for code in codes:
+                    target.pop(code, None)
+                target.update(_read_rule_sets(cur, table, code_col, codes))
+
+    return RulesSnapshot(
+        profiles=MappingProxyType(profiles),
+        type_rules=MappingProxyType(type_rules),
+        state_rules=MappingProxyType(state_rules),
+        fingerprint=fingerprint,
+        mtime_ns=mtime_ns,
+        loaded_at=time.time(),
+    )
+
+
+def diff_snapshots(old: RulesSnapshot, new: RulesSnapshot) -> dict[str, list[str]]:
+    """
+    두 스냅샷의 항목을 내용으로 비교해서 테이블별로 추가/삭제/수정된 코드 (changed_codes 와 같은 모양).
+    update_snapshot 이 재사용한 항목은 같은 객체라 비교 비용이 거의 없다.
+    """
+    changed: dict[str, list[str]] = {}
+    for table, attr in RULE_TABLES.items():
+        before, after = getattr(old, attr), getattr(new, attr)
+        codes = [code for code in sorted(before.keys() | after.keys()) if before.get(code) != after.get(code)]
+        if codes:
+            changed[table] = codes
+    return changed
+
+
+class RulesValidationError(ValueError):
+    """새로 읽은 스냅샷이 검증을 통과하지 못함 (기존 스냅샷을 계속 사용)"""
+
+    def __init__(self, problems: list[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def validate_snapshot(snap: RulesSnapshot) -> list[str]:
+    """프롬프트를 만들 수 없는 항목을 찾는다. 문제가 없으면 빈 목록"""
+    problems = []
+    if not snap.profiles:
+        problems.append("mbti_profiles: 활성 행이 없음")
+    for code, entry in snap.profiles.items():
+        if not isinstance(entry.profile, Mapping) or not entry.profile:
+            problems.append(f"mbti_profiles/{code}: profile_json 이 비어 있거나 객체가 아님")
+        elif str(entry.profile.get("type", code)).upper() != code:
+            problems.append(f"mbti_profiles/{code}: type 이 {entry.profile.get('type')!r}")
+
+    for table, attr in (("relationship_type_modifiers", "type_rules"), ("relationship_state_modifiers", "state_rules")):
+        rule_sets = getattr(snap, attr)
+        if not rule_sets:
+            problems.append(f"{table}: 활성 행이 없음")
+        for code, rule_set in rule_sets.items():
+            if not isinstance(rule_set.display_name, str) or not rule_set.display_name.strip():
+                problems.append(f"{table}/{code}: display_name 이 비어 있음")
+            if not rule_set.rules or not all(isinstance(rule, str) and rule.strip() for rule in rule_set.rules):
+                problems.append(f"{table}/{code}: rules 가 비어 있거나 문자열이 아닌 항목이 있음")
+    return problems
+
+
+class _BlobEntries(Mapping):
+    """rules.snap 의 index 는 바로 쓰고, 값은 처음 조회할 때 mmap 에서 디코딩해서 보관한다"""
+
+    def __init__(self, blob: RulesBlob, kind: int, build: Callable[[str, Optional[str], int, Any], Any]):
+        self._blob = blob
+        self._index = {code: (display_name, version, offset) for code, display_name, version, offset in blob.entries(kind)}
+        self._build = build
+        self._decoded: dict[str, Any] = {}
+
+    def __getitem__(self, code: str) -> Any:
+        item = self._decoded.get(code)
+        if item is None:
+            display_name, version, offset = self._index[code]
+            item = self._decoded[code] = self._build(code, display_name, version, self._blob.value(offset))
+        return item
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+def load_blob_snapshot(
+    blob_path: Path, db_path: Path, pool: Optional[SQLitePool] = None
+) -> tuple[Optional[RulesSnapshot], str]:
+    """
+    init_db 가 만든 rules.snap 으로 스냅샷을 만든다 (JSON 파싱 없음, 항목은 처음 조회할 때 디코딩).
+    DB 는 checksum / fingerprint 확인용으로만 읽고, 파일이 없거나 손상/stale 이면 (None, 이유) 를 돌려준다.
+    """
+    mtime_ns = os.stat(db_path).st_mtime_ns
+    try:
+        blob = RulesBlob(blob_path)
+    except FileNotFoundError:
+        return None, "missing"
+    except (BlobError, OSError) as e:
+        return None, f"invalid: {e}"
+
+    try:
+        with _reader(db_path, pool) as conn:
+            if source_checksum(conn) != blob.source_checksum:
+                blob.close()
+                return None, "stale"
+            fingerprint = tuple(conn.execute(FINGERPRINT_SQL).fetchall())
+    except Exception:
+        blob.close()
+        raise
+
+    snap = RulesSnapshot(
+        profiles=_BlobEntries(blob, KIND_PROFILE, lambda code, _, version, value: MbtiProfile(code, value, version)),
+        type_rules=_BlobEntries(blob, KIND_TYPE_RULES, lambda code, name, version, value: RuleSet(code, name, tuple(value), version)),
+        state_rules=_BlobEntries(blob, KIND_STATE_RULES, lambda code, name, version, value: RuleSet(code, name, tuple(value), version)),
+        fingerprint=fingerprint,
+        mtime_ns=mtime_ns,
+        loaded_at=time.time(),
+    )
+    return snap, "ok"
+
+
+# ==========================
+# 저장소
+# ==========================
+
+class RulesRepository:
+    """
+    rules.db 를 한 번 읽어 RulesSnapshot 으로 들고 있는다.
+    refresh_if_changed() 가 파일 mtime 과 version 컬럼을 확인해서
+    바뀌었을 때만 새 스냅샷을 만들어 참조를 통째로 교체한다.
+    blob_path 가 있으면 먼저 컴파일된 스냅샷(rules.snap)을 시도하고, 없거나 stale 이면 DB 에서 읽는다.
+    교체 전에 validate_snapshot 으로 검사해서 통과하지 못하면 기존 스냅샷을 그대로 두고 RulesValidationError.
+    """
+
+    def __init__(self, db_path: Path, pool: Optional[SQLitePool] = None, blob_path: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.pool = pool
+        self.blob_path = Path(blob_path) if blob_path else None
+        self._snapshot: Optional[RulesSnapshot] = None
+        self._lock = threading.Lock()
+        self._rejected: Optional[tuple[int, tuple]] = None  # 검증에 실패한 (mtime, fingerprint) - 같은 상태면 다시 읽지 않음
+        self.loaded_from: Optional[str] = None
+        self.blob_status: Optional[str] = None
+        self.full_reloads = 0
+        self.incremental_reloads = 0
+        self.rejected_reloads = 0
+        self.last_changes: dict[str, list[str]] = {}
+        self.last_error: Optional[str] = None
+
+    @property
+    def snapshot(self) -> RulesSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            # lifespan 밖(스크립트 등)에서 쓰일 때를 위한 지연 로드
+            snap = self.load()
+        return snap
+
+    def _swap(self, new: RulesSnapshot) -> dict[str, list[str]]:
+        # self._lock 안에서 호출. 처음 읽을 때는 비교할 기존 스냅샷이 없으므로 검증 없이 사용
+        current = self._snapshot
+        if current is not None:
+            problems = validate_snapshot(new)
+            if problems:
+                self._rejected = (new.mtime_ns, new.fingerprint)
+                self.rejected_reloads += 1
+                self.last_error = "; ".join(problems)
+                raise RulesValidationError(problems)
+        self.last_changes = diff_snapshots(current, new) if current is not None else {}
+        self.last_error = None
+        self._snapshot = new
+        return self.last_changes
+
+    def _load_full(self) -> dict[str, list[str]]:
+        # self._lock 안에서 호출
+        snap = None
+        if self.blob_path is not None:
+            snap, self.blob_status = load_blob_snapshot(self.blob_path, self.db_path, self.pool)
+        loaded_from = "blob" if snap is not None else "db"
+        if snap is None:
+            snap = load_snapshot(self.db_path, self.pool)
+        changes = self._swap(snap)
+        self.loaded_from = loaded_from
+        self.full_reloads += 1
+        return changes
+
+    def load(self) -> RulesSnapshot:
+        with self._lock:
+            self._load_full()
+            return self._snapshot
+
+    def reload(self) -> dict[str, list[str]]:
+        """바뀐 것이 없어도 전부 다시 읽어서 교체. 내용이 바뀐 코드를 돌려준다"""
+        with self._lock:
+            return self._load_full()
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "loaded_from": self.loaded_from,
+            "blob_path": str(self.blob_path) if self.blob_path else None,
+            "blob_status": self.blob_status,
+            "loaded_at": snap.loaded_at if snap else None,
+            "full_reloads": self.full_reloads,
+            "incremental_reloads": self.incremental_reloads,
+            "rejected_reloads": self.rejected_reloads,
+            "last_changes": self.last_changes,
+            "last_error": self.last_error,
+        }
+
+    def refresh_if_changed(self) -> bool:
+        """바뀐 게 있어서 스냅샷을 교체했으면 True (바뀐 코드는 last_changes)"""
+        if self._snapshot is None:
+            self.load()
+            return True
+
+        with self._lock:
+            current = self._snapshot
+            # WAL 모드에서는 커밋이 -wal 파일에만 쓰여 본 파일 mtime 이 안 바뀔 수 있으므로
+            # version 컬럼 fingerprint 도 같이 본다 (JSON 컬럼은 읽지 않는 가벼운 쿼리)
+            mtime_ns = os.stat(self.db_path).st_mtime_ns
+            with _reader(self.db_path, self.pool) as conn:
+                fingerprint = tuple(conn.execute(FINGERPRINT_SQL).fetchall())
+
+            if mtime_ns == current.mtime_ns and fingerprint == current.fingerprint:
+                return False
+            if self._rejected == (mtime_ns, fingerprint):
+                return False  # 이미 검증에 실패한 상태 그대로 → DB 가 다시 바뀔 때까지 기다림
+
+            changed = changed_codes(current.fingerprint, fingerprint)
+            if not changed:
+                # version 을 올리지 않고 내용만 고친 경우 (init_db 를 거치지 않은 수정) → 전부 다시 읽음
+                self._load_full()
+                return True
+
+            # init_db 는 바뀐 행의 version 만 올리므로 그 행들만 다시 읽는다
+            self._swap(update_snapshot(current, changed, fingerprint, mtime_ns, self.db_path, self.pool))
+            self.incremental_reloads += 1
+            return True
+
+
+# ==========================
+# live 읽기
+# ==========================
+# 스냅샷 대신 매번 DB 를 읽어야 할 때 (RULES_READ_MODE=live).
+# RulesSnapshot 과 같은 profile / *_rules_payload 를 제공하므로 프롬프트 렌더링에 그대로 쓸 수 있다.
+# SQL 문자열은 상수로 두어 커넥션별 statement cache 에 한 번만 prepare 되게 한다.
+
+PROFILE_SQL = "SELECT profile_json FROM mbti_profiles WHERE mbti=? AND is_active=1 LIMIT 1"
+TYPE_RULES_SQL = "SELECT display_name, rules_json FROM relationship_type_modifiers WHERE type_code=? AND is_active=1 LIMIT 1"
+STATE_RULES_SQL = "SELECT display_name, rules_json FROM relationship_state_modifiers WHERE state_code=? AND is_active=1 LIMIT 1"
+
+
+# 한 턴에 필요한 프로필 + 규칙 2개를 쿼리 한 번으로
+CHAT_CONTEXT_SQL = """
+    SELECT 'profile', NULL, profile_json FROM mbti_profiles WHERE mbti=? AND is_active=1
+    UNION ALL
+    SELECT 'type', display_name, rules_json FROM relationship_type_modifiers WHERE type_code=? AND is_active=1
+    UNION ALL
+    SELECT 'state', display_name, rules_json FROM relationship_state_modifiers WHERE state_code=? AND is_active=1
+"""
+
+
+class LiveRulesReader:
+    def __init__(self, pool: SQLitePool):
+        self.pool = pool
+
+    def chat_context(self, mbti: str | None, type_code: str | None, state_code: str | None) -> ChatContext:
+        mbti = mbti.upper().strip() if mbti else None
+        with self.pool.connection() as conn:
+            rows = conn.execute(CHAT_CONTEXT_SQL, (mbti, type_code, state_code)).fetchall()
+
+        found = {kind: (display_name, raw) for kind, display_name, raw in reversed(rows)}  # 중복이면 첫 행
+        type_rules = state_rules = None
+        if "type" in found:
+            type_rules = RuleSet(type_code, found["type"][0], tuple(json.loads(found["type"][1]).get("rules", [])), 0)
+        if "state" in found:
+            state_rules = RuleSet(state_code, found["state"][0], tuple(json.loads(found["state"][1]).get("rules", [])), 0)
+        return ChatContext(
+            mbti=mbti,
+            type_code=type_code,
+            state_code=state_code,
+            profile=json.loads(found["profile"][1]) if "profile" in found else {},
+            type_rules=_rules_payload("type_code", type_code, type_rules),
+            state_rules=_rules_payload("state_code", state_code, state_rules),
+        )
+
+    def profile(self, mbti: str | None) -> Mapping[str, Any]:
+        if not mbti:
+            return {}
+        with self.pool.connection() as conn:
+            row = conn.execute(PROFILE_SQL, (mbti.upper().strip(),)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _rule_set(self, sql: str, code: str) -> Optional[RuleSet]:
+        with self.pool.connection() as conn:
+            row = conn.execute(sql, (code,)).fetchone()
+        if not row:
+            return None
+        display_name, rules_json = row
+        return RuleSet(code=code, display_name=display_name, rules=tuple(json.loads(rules_json).get("rules", [])), version=0)
+
+    def type_rules_payload(self, type_code: str | None) -> dict:
+        return _rules_payload("type_code", type_code, self._rule_set(TYPE_RULES_SQL, type_code) if type_code else None)
+
+    def state_rules_payload(self, state_code: str | None) -> dict:
+        return _rules_payload("state_code", state_code, self._rule_set(STATE_RULES_SQL, state_code) if state_code else None)
@@ -0,0 +1,135 @@
+"""
+멀티 프로세스 실행 진입점
+
+    cd api && python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000] [--state-dir .state]
+
+- 부모가 main 을 import 하고 rules 스냅샷을 읽은 뒤(main.preload) fork 하므로
+  worker 들은 파싱된 스냅샷을 copy-on-write 로 공유한다 (worker 마다 다시 읽지 않음)
+- 모든 worker 가 같은 소켓을 accept 한다 (uvicorn.Server 에 부모가 bind 한 소켓을 넘김)
+- worker 가 2개 이상이면 응답 캐시 / 세션을 --state-dir 의 SQLite 파일에 두어 worker 끼리 공유
+  (RESPONSE_CACHE_PATH / SESSION_STORE_PATH 를 직접 지정하면 그 값을 따름)
+- LLM_MAX_CONCURRENCY 등 limiter / circuit breaker / 통계는 worker 별이다
+
+gunicorn 으로 띄울 때는 gunicorn.conf.py 참고.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent
+DEFAULT_STATE_DIR = API_DIR / ".state"
+
+
+def configure_shared_state(state_dir: Path, workers: int):
+    # main 은 import 시점에 환경 변수를 읽으므로 import 전에 불러야 한다
+    if workers <= 1:
+        return
+    state_dir.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("RESPONSE_CACHE_PATH", str(state_dir / "response_cache.db"))
+    os.environ.setdefault("SESSION_STORE_PATH", str(state_dir / "sessions.db"))
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str) -> int:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, lifespan="on"))
+    server.run(sockets=[sock])
+    return 0 if server.started else 1
+
+
+class Supervisor:
+    """worker 를 fork 하고, 비정상 종료된 worker 는 다시 띄운다. SIGINT/SIGTERM 은 worker 들에게 전달"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, log_level: str, restart_delay: float = 1.0):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.restart_delay = restart_delay
+        self.children: dict[int, int] = {}  # pid → worker 번호
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            # worker: 부모의 시그널 핸들러 대신 uvicorn 의 것을 쓰고, 부모의 finally/atexit 는 타지 않도록 _exit
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 1
+            try:
+                code = run_worker(self.app, self.sock, self.log_level)
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        print(f"[serve] worker {index} started (pid={pid})", flush=True)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            print(f"[serve] worker {index} (pid={pid}) exited with {code}, restarting", flush=True)
+            time.sleep(self.restart_delay)
+            if not self.stopping:
+                self.spawn(index)
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--state-dir", default=os.environ.get("SHARED_STATE_DIR", str(DEFAULT_STATE_DIR)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    configure_shared_state(Path(args.state_dir), args.workers)
+    sys.path.insert(0, str(API_DIR))
+    import main as app_main
+
+    app_main.preload()
+    sock = bind_socket(args.host, args.port)
+    print(f"[serve] listening on {args.host}:{args.port} with {args.workers} worker(s)", flush=True)
+    if args.workers <= 1:
+        sys.exit(run_worker(app_main.app, sock, args.log_level))
+    sys.exit(Supervisor(app_main.app, sock, args.workers, args.log_level).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlite_pool import ProcessConnection
+
+
+# ==========================
+# 세션 데이터
+# ==========================
+
+@dataclass
+class ChatSession:
+    id: str
+    mbti: Optional[str] = None
+    relationship_type: Optional[str] = None
+    relationship_state: Optional[str] = None
+    traits_profile: Optional[Dict[str, Any]] = None
+    messages: List[Dict[str, str]] = field(default_factory=list)  # [{"role": ..., "content": ...}]
+    summary: Optional[str] = None  # messages 보다 앞선 대화의 요약 (summarizer 가 갱신)
+    summarized_messages: int = 0  # summary 에 접혀 들어간 메시지 수
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ChatSession":
+        return cls(**json.loads(raw))
+
+
+# ==========================
+# 저장소
+# ==========================
+
+class MemorySessionStore:
+    """프로세스 메모리에 보관. max_sessions 초과/ttl 만료 시 오래된 세션부터 제거"""
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._data: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            session = self._data.get(session_id)
+            if session is None:
+                return None
+            if session.updated_at + self.ttl < time.time():
+                del self._data[session_id]
+                return None
+            self._data.move_to_end(session_id)
+            return session
+
+    def save(self, session: ChatSession):
+        session.updated_at = time.time()
+        with self._lock:
+            self._data[session.id] = session
+            self._data.move_to_end(session.id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def close(self):
+        pass
+
+
+class SqliteSessionStore:
+    """내장 SQLite 에 보관 (재시작 후에도 유지). ttl 이 지난 세션은 save 시점에 정리"""
+
+    def __init__(self, path: Path, ttl: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = ProcessConnection(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                id TEXT PRIMARY KEY,
+                data_json TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at)")
+        return conn
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.get().execute(
+                "SELECT data_json, updated_at FROM chat_sessions WHERE id=?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] + self.ttl < time.time():
+            return None
+        return ChatSession.from_json(row[0])
+
+    def save(self, session: ChatSession):
+        session.updated_at = time.time()
+        with self._lock:
+            conn = self._conn.get()
+            conn.execute("""
+                INSERT INTO chat_sessions(id, data_json, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET data_json=excluded.data_json, updated_at=excluded.updated_at
+            """, (session.id, session.to_json(), session.updated_at))
+            conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.get().execute("DELETE FROM chat_sessions WHERE id=?", (session_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.get().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SessionLocks:
+    """같은 세션에 동시에 두 턴이 들어오면 순서대로 처리되도록 세션별 asyncio.Lock"""
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            # 기다리는 쪽이 없으면 lock 객체도 정리 (세션 수만큼 쌓이지 않도록)
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id]
+                del self._locks[session_id]
@@ -0,0 +1,188 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+def enable_wal(db_path: Path) -> str:
+    """
+    DB 를 WAL 모드로 바꾼다 (파일에 저장되는 설정이라 한 번만 하면 됨, 쓰기 커넥션이 필요하므로 API 는 부르지 않음).
+    WAL 에서는 init_db 같은 writer 가 커밋하는 동안에도 reader 가 막히지 않는다.
+    읽기 전용 위치라 바꿀 수 없으면 현재 모드를 그대로 돌려준다.
+    mode=rw 로 열어서 파일이 없을 때 빈 DB 를 만들지 않는다 (없으면 "missing").
+    """
+    try:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=rw", uri=True)
+    except sqlite3.OperationalError:
+        return "missing" if not Path(db_path).exists() else "unknown"
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    except sqlite3.OperationalError:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+# fork 이후 자식이 쓰지도 닫지도 않을 부모 커넥션 (프로세스가 끝날 때까지 붙잡아 둠)
+_inherited: list[sqlite3.Connection] = []
+
+
+def forked(owner_pid: int) -> bool:
+    return owner_pid != os.getpid()
+
+
+def abandon(conn: sqlite3.Connection):
+    _inherited.append(conn)
+
+
+class ProcessConnection:
+    """
+    프로세스마다 하나씩 두는 읽기/쓰기 커넥션 (get/close 는 쓰는 쪽 lock 안에서 호출).
+    fork 된 worker 는 부모 커넥션을 쓰지 않고 connect 로 같은 파일에 자기 커넥션을 연다.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._conn = connect()
+        self._pid = os.getpid()
+
+    def get(self) -> sqlite3.Connection:
+        if forked(self._pid):
+            abandon(self._conn)
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        # 자기 커넥션을 열지 않은 자식은 부모 것을 닫지 않음
+        if not forked(self._pid):
+            self._conn.close()
+
+
+class SQLitePool:
+    """
+    읽기 전용 SQLite 커넥션 풀.
+    - 커넥션은 필요할 때 size 개까지 만들고 재사용 (connect/close 를 요청마다 하지 않음)
+    - mode=ro + PRAGMA query_only: 실수로라도 쓰기 불가
+    - mmap_size: 페이지를 read() 대신 mmap 으로 읽음
+    - cached_statements: 같은 SQL 문자열은 커넥션마다 한 번만 prepare
+    check_same_thread=False 로 열지만 한 커넥션은 한 번에 한 스레드만 쓴다 (connection() 으로 빌려 쓰기 때문).
+    fork 된 worker 는 부모가 열어둔 커넥션을 쓰지 않고 자기 커넥션을 새로 연다.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        size: int = 4,
+        timeout: float = 5.0,
+        mmap_size: int = 64 * 1024 * 1024,
+        cached_statements: int = 64,
+    ):
+        self.db_path = Path(db_path)
+        self.size = size
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pid = os.getpid()
+        self.checkouts = 0
+        self.waits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA query_only=1")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    def _after_fork(self):
+        # SQLite 커넥션은 fork 경계를 넘어 쓰면 안 된다. 부모 것은 참조만 남겨두고 (close 하면
+        # 자식 쪽에서 checkpoint 를 시도할 수 있음) 새 커넥션으로 시작
+        while True:
+            try:
+                abandon(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire(self) -> sqlite3.Connection:
+        if forked(self._pid):
+            self._after_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"sqlite pool exhausted ({self.size} connections busy)") from None
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if self._closed:
+            raise RuntimeError("sqlite pool is closed")
+        conn = self._acquire()
+        self.checkouts += 1
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            broken = True  # 깨졌을 수 있는 커넥션은 돌려놓지 않고 버림
+            raise
+        finally:
+            if broken or self._closed:
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "open": self._created,
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+        }
@@ -0,0 +1,129 @@
+import json
+
+
+# ==========================
+# 스트리밍 JSON 파서
+# ==========================
+# LLM 이 CHAT_SCHEMA 형태의 JSON 을 토큰 단위로 흘려줄 때,
+# 최상위의 특정 문자열 필드(assistant_message) 값만 완성 전에 먼저 꺼내기 위한 파서.
+# 전체 JSON 은 스트림이 끝난 뒤 json.loads 로 한 번에 파싱한다.
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonStringFieldStreamer:
+    """
+    feed(chunk) 로 JSON 텍스트 조각을 넣으면,
+    최상위 객체의 `field` 문자열 값 중 이번 조각에서 새로 확정된 부분을 돌려준다.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._stack: list[str] = []  # "{" / "["
+        self._in_str = False
+        self._esc = False
+        self._unicode: str | None = None  # \\uXXXX 수집 중인 hex
+        self._high_surrogate: int | None = None
+        self._expect_key = False
+        self._is_key = False
+        self._key_buf: list[str] = []
+        self._last_key: str | None = None
+        self._capturing = False
+        self.done = False  # 대상 필드 값이 끝까지 나왔는지
+
+    def feed(self, chunk: str) -> str:
+        out: list[str] = []
+        for c in chunk:
+            if self._in_str:
+                self._feed_str_char(c, out)
+            else:
+                self._feed_struct_char(c)
+        return "".join(out)
+
+    # --- 문자열 내부 ---
+
+    def _emit(self, s: str, out: list[str]):
+        if self._is_key:
+            self._key_buf.append(s)
+        elif self._capturing:
+            out.append(s)
+
+    def _emit_code_unit(self, code: int, out: list[str]):
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(code), out)
+
+    def _feed_str_char(self, c: str, out: list[str]):
+        if self._unicode is not None:
+            self._unicode += c
+            if len(self._unicode) == 4:
+                code = int(self._unicode, 16)
+                self._unicode = None
+                self._emit_code_unit(code, out)
+            return
+
+        if self._esc:
+            self._esc = False
+            if c == "u":
+                self._unicode = ""
+            else:
+                self._emit(_ESCAPES.get(c, c), out)
+            return
+
+        if c == "\\":
+            self._esc = True
+        elif c == '"':
+            self._in_str = False
+            if self._is_key:
+                if len(self._stack) == 1:
+                    self._last_key = "".join(self._key_buf)
+                self._key_buf = []
+                self._is_key = False
+            elif self._capturing:
+                self._capturing = False
+                self.done = True
+        else:
+            self._emit(c, out)
+
+    # --- 구조 문자 ---
+
+    def _feed_struct_char(self, c: str):
+        if c == '"':
+            self._in_str = True
+            self._is_key = self._expect_key
+            self._capturing = (
+                not self._is_key
+                and not self.done
+                and len(self._stack) == 1
+                and self._last_key == self.field
+            )
+        elif c in "{[":
+            self._stack.append(c)
+            self._expect_key = c == "{"
+        elif c in "}]":
+            if self._stack:
+                self._stack.pop()
+            self._expect_key = False
+        elif c == ":":
+            self._expect_key = False
+        elif c == ",":
+            self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+            if len(self._stack) == 1:
+                self._last_key = None
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
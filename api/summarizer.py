@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from context_window import ROLE_LABELS
+from sessions import SessionLocks
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_INSTRUCTIONS = """
+너는 연애/관계 상담 대화의 기록 담당자야.
+[기존 요약]에 [새 대화]의 내용을 합쳐서 갱신된 요약만 출력해.
+- 상대방의 행동, 사용자의 감정/고민, 이미 했던 조언, 확인된 사실 위주로 남길 것
+- 시간 순서를 유지하고, 중복은 합칠 것
+- {max_chars}자 이내의 한국어 평문 (머리말/JSON 금지)
+""".strip()
+
+
+def next_turn_size(messages: list[dict], limit: int) -> int:
+    # 한 번에 접는 단위: 사용자 메시지 + 바로 뒤 상담사 답변 한 쌍
+    if limit >= 2 and messages[0]["role"] == "user" and messages[1]["role"] == "assistant":
+        return 2
+    return 1
+
+
+def render_fold_input(summary: str | None, turn: list[dict]) -> str:
+    lines = "\n".join(f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in turn)
+    return f"[기존 요약]\n{summary or '(없음)'}\n\n[새 대화]\n{lines}"
+
+
+class SessionSummarizer:
+    """
+    세션 히스토리 중 컨텍스트 창 밖으로 밀려난 턴을 백그라운드에서 한 턴씩 요약에 접어 넣는다.
+    접힌 메시지는 세션 히스토리에서 빠지고 session.summary 만 남으므로,
+    대화가 길어져도 매 턴 보내는 입력 크기가 거의 일정하게 유지된다.
+    """
+
+    def __init__(
+        self,
+        store,
+        locks: SessionLocks,
+        count_overflow: Callable[[list[dict]], int],
+        complete: Callable[[str, str], Awaitable[str]],
+        max_chars: int = 800,
+        max_concurrency: int = 2,
+    ):
+        self.store = store
+        self.locks = locks
+        self.count_overflow = count_overflow  # 히스토리 중 창 밖으로 밀려난 앞쪽 메시지 수
+        self.complete = complete  # (instructions, input_text) -> 요약 텍스트
+        self.max_chars = max_chars
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.folded_turns = 0
+        self.failures = 0
+
+    def schedule(self, session_id: str):
+        # 세션당 작업은 하나만. 이미 돌고 있으면 그 작업이 남은 턴까지 이어서 처리한다
+        task = self._tasks.get(session_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(session_id, None) if self._tasks.get(session_id) is t else None)
+
+    async def _run(self, session_id: str):
+        while True:
+            async with self.locks.hold(session_id):
+                session = self.store.get(session_id)
+                if session is None:
+                    return
+                overflow = self.count_overflow(session.messages)
+                if overflow <= 0:
+                    return
+                turn = session.messages[:next_turn_size(session.messages, overflow)]
+                summary = session.summary
+
+            # LLM 호출 중에는 세션 lock 을 잡지 않음 (사용자 턴을 막지 않도록)
+            try:
+                async with self._sem:
+                    new_summary = await self.complete(
+                        SUMMARY_INSTRUCTIONS.format(max_chars=self.max_chars),
+                        render_fold_input(summary, turn),
+                    )
+            except Exception:
+                self.failures += 1
+                logger.warning("summary 갱신 실패 (session=%s)", session_id, exc_info=True)
+                return
+
+            new_summary = new_summary.strip()[: self.max_chars * 2]
+            if not new_summary:
+                self.failures += 1
+                return
+
+            async with self.locks.hold(session_id):
+                session = self.store.get(session_id)
+                # 그 사이 세션이 바뀌었으면(삭제/재시작) 이번 결과는 버림
+                if session is None or session.summary != summary or session.messages[:len(turn)] != turn:
+                    return
+                session.summary = new_summary
+                session.messages = session.messages[len(turn):]
+                session.summarized_messages += len(turn)
+                self.store.save(session)
+                self.folded_turns += 1
+
+    async def drain(self):
+        # 종료 시 진행 중인 요약 작업 정리
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"running": len(self._tasks), "folded_turns": self.folded_turns, "failures": self.failures}
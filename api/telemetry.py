@@ -0,0 +1,124 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterable
+
+
+# 10us ~ 30s. CPU 단계(수십 us)와 upstream 호출(수 초)을 같은 버킷으로 본다
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+class _Series:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    라벨 하나짜리 Prometheus histogram.
+    observe 는 bisect 한 번 + 정수 증가뿐이라 요청마다 여러 번 불러도 부담이 없다.
+    lock 은 새 라벨 series 를 만들 때와 render 가 series 목록을 복사할 때만 잡는다
+    (/metrics 는 threadpool 에서 도는 동안 이벤트 루프가 새 series 를 추가할 수 있음).
+    """
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series: dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        series = self._series.get(label_value)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(label_value, _Series(len(self.buckets) + 1))
+        series.counts[bisect_left(self.buckets, seconds)] += 1
+        series.total += seconds
+        series.count += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            rows = [(value, list(series.counts), series.total) for value, series in self._series.items()]
+        for value, counts, total in sorted(rows):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{self.label}="{_escape(value)}",le="{bound:g}"}} {cumulative}')
+            count = sum(counts)  # 복사한 bucket 기준으로 세어야 +Inf 와 누적값이 맞음
+            lines.append(f'{self.name}_bucket{{{self.label}="{_escape(value)}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{self.label}="{_escape(value)}"}} {total:.9f}')
+            lines.append(f'{self.name}_count{{{self.label}="{_escape(value)}"}} {count}')
+        return lines
+
+
+# 수집 시점에 기존 stats 에서 값을 읽어오는 collector: (이름, 타입, 설명, [(라벨, 값), ...])
+Metric = tuple[str, str, str, Iterable[tuple[dict, float]]]
+
+
+class Telemetry:
+    def __init__(self, prefix: str = "mbti"):
+        self.prefix = prefix
+        self.stages = Histogram(f"{prefix}_stage_seconds", "hot path 단계별 소요 시간", "stage")
+        self._collectors: list[Callable[[], Iterable[Metric]]] = []
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.observe(stage, time.perf_counter() - started)
+
+    def timed(self, stage: str):
+        # 동기 함수용 데코레이터 (예외가 나도 시간은 기록)
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.stages.observe(stage, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def observe(self, stage: str, seconds: float):
+        self.stages.observe(stage, seconds)
+
+    def collector(self, fn: Callable[[], Iterable[Metric]]):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = self.stages.render()
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full} {help}")
+                lines.append(f"# TYPE {full} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{full}{_labels(labels)} {float(value):g}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,25 @@
+from typing import Any, Mapping
+
+
+# ==========================
+# 구조 공유 병합
+# ==========================
+# 예전 deep_merge 는 재귀 단계마다 base 를 deepcopy 해서, 바뀌지 않는 하위 트리까지 매번 새로 만들었다.
+# 여기서는 state 가 실제로 건드리는 경로만 얕은 복사로 새로 만들고 나머지 하위 트리는 그대로 공유한다.
+# 입력은 절대 수정하지 않는다. 대신 결과도 (공유 중이므로) 읽기 전용으로 다뤄야 한다.
+
+def deep_merge(base: Mapping[str, Any], state: Mapping[str, Any]) -> dict:
+    if not state:
+        return base if isinstance(base, dict) else dict(base)
+    if not base:
+        return state if isinstance(state, dict) else dict(state)
+
+    merged = dict(base)
+    for k, v in state.items():
+        current = merged.get(k)
+        if isinstance(v, Mapping) and isinstance(current, Mapping):
+            merged[k] = deep_merge(current, v)
+        else:
+            merged[k] = v
+    return merged
+
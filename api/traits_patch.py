@@ -0,0 +1,245 @@
+import json
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Mapping
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성: 없으면 표준 json
+    orjson = None
+
+
+# user.xxx / partner.xxx 같은 점(.) 경로만 허용 (최대 8 depth)
+PATCH_KEY_RE = re.compile(r"^(user|partner|context|signals)(\.[a-zA-Z0-9_]+){1,8}$")
+
+
+# ==========================
+# 경로 컴파일
+# ==========================
+
+@lru_cache(maxsize=4096)
+def compile_path(path: str) -> tuple[str, ...]:
+    # "user.memory.patterns" → ("user", "memory", "patterns"). 같은 경로는 한 번만 split
+    return tuple(path.split("."))
+
+
+@lru_cache(maxsize=4096)
+def validate_path(path: str) -> tuple[str, ...] | None:
+    # 허용 prefix 확인은 PATCH_KEY_RE 가 같이 하므로 정규식 한 번 + split 한 번 (경로별로 캐시)
+    if not PATCH_KEY_RE.match(path):
+        return None
+    return compile_path(path)
+
+
+def _is_prefix(prefix: tuple[str, ...], path: tuple[str, ...]) -> bool:
+    return len(prefix) <= len(path) and path[: len(prefix)] == prefix
+
+
+# ==========================
+# 결과
+# ==========================
+
+@dataclass
+class PatchConflict:
+    path: str
+    reason: str  # overwritten | replaced_non_object
+    by: str | None = None
+
+    def to_dict(self) -> dict:
+        out = {"path": self.path, "reason": self.reason}
+        if self.by is not None:
+            out["by"] = self.by
+        return out
+
+
+@dataclass
+class PatchResult:
+    state: dict  # 패치가 적용된 새 state (바뀌지 않은 하위 트리는 원본과 공유)
+    diff: list[dict] = field(default_factory=list)  # 실제로 값이 바뀐 [{path, value}]
+    conflicts: list[PatchConflict] = field(default_factory=list)
+
+    def diff_payload(self) -> dict:
+        return {"ops": self.diff, "conflicts": [c.to_dict() for c in self.conflicts]}
+
+
+_MISSING = object()
+
+
+# ==========================
+# 검증 (LLM 출력 → [{path, value}])
+# ==========================
+
+def _reject_constant(name: str):
+    # 표준 json 은 NaN/Infinity 를 받아주지만 JSON 표준이 아니므로 orjson 과 똑같이 거부
+    raise ValueError(f"invalid JSON constant: {name}")
+
+
+def decode_json(raw: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw, parse_constant=_reject_constant)
+
+
+def _within_limits(value: Any, max_depth: int, max_nodes: int) -> str | None:
+    # 디코딩된 값의 깊이/노드 수를 한 번 훑어서 초과하면 사유를 반환
+    stack = [(value, 1)]
+    nodes = 0
+    while stack:
+        current, depth = stack.pop()
+        nodes += 1
+        if nodes > max_nodes:
+            return "too_many_nodes"
+        if isinstance(current, dict):
+            if depth > max_depth:
+                return "too_deep"
+            stack.extend((v, depth + 1) for v in current.values())
+        elif isinstance(current, list):
+            if depth > max_depth:
+                return "too_deep"
+            stack.extend((v, depth + 1) for v in current)
+    return None
+
+
+class PatchValidator:
+    """
+    updated_traits_patch 항목마다 경로 검증 + value_json 디코딩을 한 번에 하고,
+    크기/깊이/노드 수 제한으로 LLM 이 만든 큰 값이 CPU/메모리를 잡아먹지 않게 막는다.
+    디코딩된 값은 그대로 다시 직렬화 가능하므로 json.dumps 확인은 하지 않는다.
+    거절 사유별 건수는 stats() 로 본다.
+    """
+
+    def __init__(self, max_items: int = 20, max_value_chars: int = 4000, max_depth: int = 6, max_nodes: int = 200):
+        self.max_items = max_items
+        self.max_value_chars = max_value_chars
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _check(self, item: Any) -> tuple[dict | None, str]:
+        if not isinstance(item, dict):
+            return None, "not_object"
+
+        path = item.get("path")
+        value_json = item.get("value_json")
+        if not isinstance(path, str) or not isinstance(value_json, str):
+            return None, "missing_fields"
+
+        path = path.strip()
+        if validate_path(path) is None:
+            return None, "bad_path"
+
+        # 디코딩 전에 길이부터 (큰 입력은 파싱 비용 자체를 치르지 않음)
+        if len(value_json) > self.max_value_chars:
+            return None, "too_large"
+
+        try:
+            value = decode_json(value_json)
+        except ValueError:  # json/orjson 의 JSONDecodeError 모두 ValueError 하위 클래스
+            return None, "bad_json"
+
+        if isinstance(value, (dict, list)):
+            reason = _within_limits(value, self.max_depth, self.max_nodes)
+            if reason:
+                return None, reason
+
+        return {"path": path, "value": value}, "accepted"
+
+    def filter(self, patch: Any) -> list[dict]:
+        counts: Counter = Counter()
+        filtered: list[dict] = []
+
+        if not isinstance(patch, list):
+            counts["not_list"] += 1
+        else:
+            for i, item in enumerate(patch):
+                if i >= self.max_items:
+                    counts["too_many_items"] += len(patch) - i
+                    break
+                ok, reason = self._check(item)
+                counts[reason] += 1
+                if ok is not None:
+                    filtered.append(ok)
+
+        with self._lock:
+            self._counts.update(counts)
+        return filtered
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"json_backend": "orjson" if orjson is not None else "json", **self._counts}
+
+
+# ==========================
+# 적용
+# ==========================
+
+def _build_trie(ops: list[tuple[tuple[str, ...], str, Any]]) -> dict:
+    # 노드: {"children": {key: node}, "value": ...(있으면)}
+    # ops 에는 덮어써진 쓰기가 이미 빠져 있으므로, 상위 경로 값 위에 하위 경로 쓰기가 얹히는 경우만 남는다
+    root: dict = {"children": {}}
+    for keys, _, value in ops:
+        node = root
+        for k in keys:
+            node = node["children"].setdefault(k, {"children": {}})
+        node["value"] = value
+    return root
+
+
+def _apply_node(current: Any, node: dict, path: tuple[str, ...], result: PatchResult) -> Any:
+    if "value" in node:
+        value = node["value"]
+        if current is _MISSING or current != value:
+            result.diff.append({"path": ".".join(path), "value": value})
+        if not node["children"]:
+            return value
+        current = value
+
+    if not node["children"]:
+        return current
+
+    if current is _MISSING or current is None:
+        updated: dict = {}
+    elif isinstance(current, Mapping):
+        updated = dict(current)  # 이 경로만 얕은 복사
+    else:
+        # 객체가 아닌 값 아래로 경로를 만들어야 하는 경우: 값을 객체로 교체
+        result.conflicts.append(PatchConflict(".".join(path), "replaced_non_object"))
+        updated = {}
+
+    for k, child in node["children"].items():
+        updated[k] = _apply_node(updated.get(k, _MISSING), child, path + (k,), result)
+    return updated
+
+
+def apply_patches(state: Mapping[str, Any], patches: list[dict]) -> PatchResult:
+    """
+    [{path, value}, ...] 를 state 에 한 번에 적용한다 (순서대로 적용한 것과 같은 결과).
+    - 같은 경로/상위 경로가 뒤에서 다시 쓰이면 앞선 쓰기는 버리고 conflict 로 보고
+    - 원본 state 는 수정하지 않고, 바뀐 경로의 dict 만 새로 만든다
+    """
+    ops = [(compile_path(p["path"]), p["path"], p["value"]) for p in patches]
+    result = PatchResult(state={})
+
+    # 뒤에서부터 보면서, 이후에 같은/상위 경로로 덮어써지는 쓰기를 걸러냄
+    kept: list[tuple[tuple[str, ...], str, Any]] = []
+    later: list[tuple[tuple[str, ...], str]] = []
+    for keys, path, value in reversed(ops):
+        shadow = next((p for k, p in later if _is_prefix(k, keys)), None)
+        if shadow is not None:
+            result.conflicts.append(PatchConflict(path, "overwritten", by=shadow))
+        else:
+            kept.append((keys, path, value))
+        later.append((keys, path))
+    kept.reverse()
+    result.conflicts.reverse()
+
+    if not kept:
+        result.state = state if isinstance(state, dict) else dict(state)
+        return result
+
+    result.state = _apply_node(state, _build_trie(kept), (), result)
+    return result
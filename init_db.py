@@ -1,8 +1,15 @@
+import argparse
+import hashlib
 import sqlite3
 import json
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "api"))
+from rules_blob import BlobError, RulesBlob, source_checksum, write_blob  # noqa: E402
+
 DB_PATH = Path("rules.db")
+SNAPSHOT_PATH = DB_PATH.with_suffix(".snap")  # API 가 mmap 으로 읽는 컴파일된 스냅샷
 
 REL_TYPE_RULES = [
     ("romantic_interest", "썸", [
@@ -693,11 +700,25 @@ MBTI_PROFILES = [
   }
 ]
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+# ==========================
+# 동기화 (바뀐 행만 upsert)
+# ==========================
+# (테이블, 코드 컬럼, JSON 컬럼)
+TABLES = {
+    "relationship_type_modifiers": ("type_code", "rules_json"),
+    "relationship_state_modifiers": ("state_code", "rules_json"),
+    "mbti_profiles": ("mbti", "profile_json"),
+}
+
+
+def content_hash(values: dict, json_col: str) -> str:
+    # JSON 컬럼은 파싱해서 키 순서/공백과 무관하게 비교 (DB 에 저장된 행도 같은 방식으로 계산)
+    canonical = {**values, json_col: json.loads(values[json_col])}
+    raw = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 
-    # 테이블 생성
+def ensure_schema(cur):
     cur.execute("""
     CREATE TABLE IF NOT EXISTS relationship_type_modifiers (
         type_code TEXT PRIMARY KEY,
@@ -729,32 +750,133 @@ def main():
     );
     """)
 
-    # upsert(간단하게 delete 후 insert로)
-    for code, name, rules in REL_TYPE_RULES:
-        cur.execute("DELETE FROM relationship_type_modifiers WHERE type_code=?", (code,))
-        cur.execute("""
-        INSERT INTO relationship_type_modifiers(type_code, display_name, rules_json, prompt_hint, version, is_active)
-        VALUES (?, ?, ?, ?, 1, 1)
-        """, (code, name, json.dumps({"rules": rules}, ensure_ascii=False), None))
+    # 예전 init_db 가 추가했던 content_hash 컬럼 (비교는 매번 컬럼 값으로 하므로 저장하지 않음)
+    for table in TABLES:
+        columns = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+        if "content_hash" in columns:
+            cur.execute(f"ALTER TABLE {table} DROP COLUMN content_hash")
+
+
+def sync_table(cur, table: str, rows: dict[str, dict]) -> dict:
+    """
+    rows: 코드 → 컬럼 값. 내용(hash)이 같고 활성 상태인 행은 건드리지 않고,
+    새 행은 version=1 로 추가, 바뀐 행(비활성 → 활성 포함)은 version 을 올려서 덮어쓴다.
+    """
+    code_col, json_col = TABLES[table]
+    value_cols = list(next(iter(rows.values())))
+
+    # hash 는 저장하지 않고 매번 컬럼 값으로 계산 (init_db 밖에서 고친 행도 잡도록, 행이 적어서 부담 없음)
+    existing = {}
+    for code, is_active, *values in cur.execute(
+        f"SELECT {code_col}, is_active, {', '.join(value_cols)} FROM {table}"
+    ):
+        try:
+            existing[code] = (content_hash(dict(zip(value_cols, values)), json_col), is_active)
+        except ValueError:
+            existing[code] = (None, is_active)  # JSON 이 깨진 행 → 시드와 다른 것으로 보고 덮어씀
+
+    report = {"added": [], "changed": [], "unchanged": [], "not_in_seed": sorted(set(existing) - set(rows))}
 
-    for code, name, rules in REL_STATE_RULES:
-        cur.execute("DELETE FROM relationship_state_modifiers WHERE state_code=?", (code,))
-        cur.execute("""
-        INSERT INTO relationship_state_modifiers(state_code, display_name, rules_json, prompt_hint, version, is_active)
-        VALUES (?, ?, ?, ?, 1, 1)
-        """, (code, name, json.dumps({"rules": rules}, ensure_ascii=False), None))
+    upsert = f"""
+    INSERT INTO {table}({code_col}, {', '.join(value_cols)}, version, is_active)
+    VALUES (?, {', '.join('?' for _ in value_cols)}, 1, 1)
+    ON CONFLICT({code_col}) DO UPDATE SET
+        {', '.join(f'{col}=excluded.{col}' for col in value_cols)},
+        version={table}.version + 1,
+        is_active=1
+    """
+    for code, values in rows.items():
+        new_hash = content_hash(values, json_col)
+        found = existing.get(code)
+        if found is None:
+            report["added"].append(code)
+        elif found == (new_hash, 1):
+            report["unchanged"].append(code)
+            continue
+        else:
+            report["changed"].append(code)
+        cur.execute(upsert, (code, *values.values()))
+    return report
+
+
+def seed_rows() -> dict[str, dict[str, dict]]:
+    return {
+        "relationship_type_modifiers": {
+            code: {"display_name": name, "rules_json": json.dumps({"rules": rules}, ensure_ascii=False), "prompt_hint": None}
+            for code, name, rules in REL_TYPE_RULES
+        },
+        "relationship_state_modifiers": {
+            code: {"display_name": name, "rules_json": json.dumps({"rules": rules}, ensure_ascii=False), "prompt_hint": None}
+            for code, name, rules in REL_STATE_RULES
+        },
+        "mbti_profiles": {
+            prof["type"].upper(): {"profile_json": json.dumps(prof, ensure_ascii=False)}
+            for prof in MBTI_PROFILES
+        },
+    }
+
+
+def sync(db_path: Path) -> dict:
+    """스키마 생성 + 모든 테이블 동기화를 한 트랜잭션으로. 테이블별 added/changed/unchanged 를 돌려준다"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # WAL 은 파일에 저장되는 설정이라 writer 인 여기서만 켠다 (API 는 mode=ro 로 읽기만 함)
+        # WAL 에서는 동기화 커밋 중에도 API 의 읽기가 막히지 않는다. 트랜잭션 밖에서만 바꿀 수 있음
+        conn.execute("PRAGMA journal_mode=WAL")
+        cur = conn.cursor()
+        # 바뀐 게 없으면 아무것도 쓰지 않으므로 API 쪽 fingerprint/mtime 도 그대로 (reload 안 함)
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            ensure_schema(cur)
+            report = {table: sync_table(cur, table, rows) for table, rows in seed_rows().items()}
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return report
+
+
+def snapshot_is_fresh(db_path: Path, snapshot_path: Path) -> bool:
+    try:
+        blob = RulesBlob(snapshot_path)
+    except (OSError, BlobError):
+        return False
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return source_checksum(conn) == blob.source_checksum
+        finally:
+            conn.close()
+    finally:
+        blob.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rules.db 시드 동기화 (바뀐 행만 upsert) + rules.snap 생성")
+    parser.add_argument("--report", default=None, help="동기화 결과 JSON 을 저장할 경로")
+    args = parser.parse_args()
 
-    for prof in MBTI_PROFILES:
-        mbti = prof["type"].upper()
-        cur.execute("DELETE FROM mbti_profiles WHERE mbti=?", (mbti,))
-        cur.execute("""
-        INSERT INTO mbti_profiles(mbti, profile_json, version, is_active)
-        VALUES (?, ?, 1, 1)
-        """, (mbti, json.dumps(prof, ensure_ascii=False)))
+    report = sync(DB_PATH)
+    totals = {key: sum(len(r[key]) for r in report.values()) for key in ("added", "changed", "unchanged")}
+    print(
+        f"✅ DB synced: {DB_PATH.resolve()} "
+        f"(added {totals['added']}, changed {totals['changed']}, unchanged {totals['unchanged']})"
+    )
+    for table, result in report.items():
+        for key in ("added", "changed", "not_in_seed"):
+            if result[key]:
+                print(f"   {table} {key}: {', '.join(result[key])}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    conn.commit()
-    conn.close()
-    print(f"✅ DB initialized: {DB_PATH.resolve()}")
+    # DB 가 원본이고 스냅샷은 내용이 바뀌었거나 없을 때만 다시 만든다 (checksum 이 안 맞으면 API 가 무시함)
+    if totals["added"] or totals["changed"] or not snapshot_is_fresh(DB_PATH, SNAPSHOT_PATH):
+        size = write_blob(DB_PATH, SNAPSHOT_PATH)
+        print(f"✅ snapshot compiled: {SNAPSHOT_PATH.resolve()} ({size} bytes)")
+    else:
+        print(f"✅ snapshot up to date: {SNAPSHOT_PATH.resolve()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -29,21 +29,33 @@ type ChatResponse = {
   };
 };
 
-function applyPatchToState(original: TraitsProfile, patch: { path: string; value: any }[]) {
-  const updated: TraitsProfile = JSON.parse(JSON.stringify(original));
-
-  patch.forEach(({ path, value }) => {
-    const keys = path.split(".");
-    let target = updated.state;
-
-    for (let i = 0; i < keys.length - 1; i++) {
-      if (!target[keys[i]]) target[keys[i]] = {};
-      target = target[keys[i]];
+// text/event-stream 응답을 "event: x\ndata: {...}\n\n" 단위로 잘라서 콜백 호출
+async function readSSE(body: ReadableStream<Uint8Array>, onEvent: (event: string, data: any) => void) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      try {
+        onEvent(event, data ? JSON.parse(data) : {});
+      } catch {}
     }
-    target[keys[keys.length - 1]] = value;
-  });
-
-  return updated;
+  }
 }
 
 export default function Home() {
@@ -63,6 +75,9 @@ export default function Home() {
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
 
+  // 서버 세션: 히스토리/traits 는 서버가 들고 있고, 매 턴 새 메시지만 보낸다
+  const [sessionId, setSessionId] = useState<string | null>(null);
+
   const base = useMemo(
     () => process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000",
     []
@@ -100,6 +115,29 @@ export default function Home() {
     setTraitsProfile(initial);
   }, [mbti]);
 
+  // ✅ 세션 설정(MBTI/관계)이 바뀌면 다음 전송 때 새 세션을 만든다
+  useEffect(() => {
+    setSessionId(null);
+  }, [mbti, relationshipType, relationshipState]);
+
+  const createSession = async (history: ChatMsg[], traits: TraitsProfile | null) => {
+    const res = await fetch(`${base}/sessions`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        mbti: mbti || null,
+        relationship_type: relationshipType || null,
+        relationship_state: relationshipState || null,
+        traits_profile: traits || null,
+        messages: history.map(({ role, content }) => ({ role, content })),
+      }),
+    });
+    if (!res.ok) throw new Error(`API Error: ${res.status}`);
+    const data = await res.json();
+    setSessionId(data.session_id);
+    return data.session_id as string;
+  };
+
   const send = async () => {
     const text = input.trim();
     if (!text || sending) return;
@@ -113,55 +151,69 @@ export default function Home() {
     })();
 
     // 1) 유저 메시지 즉시 반영
-    const nextMessages: ChatMsg[] = [...messages, { role: "user", content: text }];
-    setMessages(nextMessages);
+    const history = messages;
+    setMessages([...history, { role: "user", content: text }]);
     setInput("");
     setSending(true);
 
-    try {
-      const res = await fetch(`${base}/chat`, {
+    // 2) 스트리밍 응답을 받을 빈 봇 메시지를 먼저 추가
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+
+    const updateLastAssistant = (fn: (m: ChatMsg) => ChatMsg) => {
+      setMessages((prev) => {
+        const next = [...prev];
+        next[next.length - 1] = fn(next[next.length - 1]);
+        return next;
+      });
+    };
+
+    const postTurn = (id: string) =>
+      fetch(`${base}/sessions/${id}/chat/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          messages: nextMessages,
-          mbti: mbti || null,
-          relationship_type: relationshipType || null,
-          relationship_state: relationshipState || null,
-          traits_profile: latestTraitsProfile || null,
-        }),
+        body: JSON.stringify({ message: text }),
       });
 
-      if (!res.ok) throw new Error(`API Error: ${res.status}`);
-
-      const data: ChatResponse = await res.json();
+    try {
+      let id = sessionId ?? (await createSession(history, latestTraitsProfile));
+      let res = await postTurn(id);
 
-      // 2) ✅ 서버가 준 patch는 "data.analysis_json.updated_traits_patch" 안에 있음
-      const patch = data?.analysis_json?.updated_traits_patch;
+      // 세션이 만료됐으면 지금까지의 대화로 새로 만들고 한 번 더
+      if (res.status === 404) {
+        id = await createSession(history, latestTraitsProfile);
+        res = await postTurn(id);
+      }
 
-      if (Array.isArray(patch) && latestTraitsProfile) {
-        const updated = applyPatchToState(latestTraitsProfile, patch);
-        localStorage.setItem("traits_profile", JSON.stringify(updated));
-        setTraitsProfile(updated);
+      if (!res.ok || !res.body) throw new Error(`API Error: ${res.status}`);
+
+      let received = "";
+      await readSSE(res.body, (event, data) => {
+        if (event === "delta") {
+          received += data.text ?? "";
+          updateLastAssistant((m) => ({ ...m, content: received }));
+        } else if (event === "analysis") {
+          const analysis: ChatResponse["analysis_json"] = data;
+          const followUps = analysis?.follow_up_questions ?? [];
+          updateLastAssistant((m) => ({
+            ...m,
+            followUps: Array.isArray(followUps) ? followUps.slice(0, 3) : [],
+          }));
+        } else if (event === "traits") {
+          // 3) ✅ patch 는 서버가 적용해서 갱신된 traits_profile 을 보내줌
+          if (data) {
+            localStorage.setItem("traits_profile", JSON.stringify(data));
+            setTraitsProfile(data);
+          }
+        } else if (event === "error") {
+          updateLastAssistant((m) => ({ ...m, content: data.message ?? "응답 생성 실패" }));
+        }
+      });
 
-        // 디버그로 확인하고 싶으면 켜
-        // console.log("LLM patch applied:", patch);
+      if (!received) {
+        updateLastAssistant((m) => (m.content ? m : { ...m, content: "응답이 비었어." }));
       }
-      const followUps = data?.analysis_json?.follow_up_questions ?? [];
-
-      // 3) 봇 메시지 추가
-      setMessages((prev) => [
-        ...prev,
-        {
-          role: "assistant",
-          content: data.assistant_message ?? "응답이 비었어.",
-          followUps : Array.isArray(followUps) ? followUps.slice(0, 3) : [],
-        },
-      ]);
     } catch (e: any) {
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: `에러: ${e?.message || "Unknown error"}` },
-      ]);
+      updateLastAssistant((m) => ({ ...m, content: `에러: ${e?.message || "Unknown error"}` }));
     } finally {
       setSending(false);
     }
@@ -175,6 +227,10 @@ export default function Home() {
   };
 
   const resetAll = () => {
+    if (sessionId) {
+      fetch(`${base}/sessions/${sessionId}`, { method: "DELETE" }).catch(() => {});
+      setSessionId(null);
+    }
     setMessages([{ role: "assistant", content: "대화를 초기화했어. 다시 말해줘!" }]);
     localStorage.removeItem("traits_profile");
     setTraitsProfile(null);
@@ -250,6 +306,8 @@ export default function Home() {
       >
         {messages.map((m, idx) => {
           const isUser = m.role === "user";
+          // 스트리밍 시작 전 빈 봇 메시지는 아래 "입력 중…" 으로 대신 표시
+          if (!isUser && !m.content) return null;
           return (
             <div
               key={idx}
@@ -296,7 +354,7 @@ export default function Home() {
           );
         })}
 
-        {sending && (
+        {sending && !messages[messages.length - 1]?.content && (
           <div style={{ display: "flex", justifyContent: "flex-start" }}>
             <div
               style={{